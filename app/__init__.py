@@ -1,30 +1,86 @@
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from app.extensions import db, migrate, bcrypt, jwt
-from flask_jwt_extended import JWTManager
-from app.controllers.auth_controller import auth
-from app.controllers.users.user_controller import users
-from app.controllers.services.service_controller import services
-from app.controllers.farmer.farmer_controller import farmers
-from app.controllers.booking.booking_controller import bookings
-from app.controllers.feedback.feedback_controller import feedback
+import importlib
 
+import click
+from flask import Flask
+from app.extensions import db, jwt
+from app.db_routing import replica_router
+from app.catalog_cache import service_catalog
+from app.passwords import password_hasher
+from app.user_search import user_search_index
+from app.farmer_index import farmer_index
+from app.write_buffer import feedback_buffer
+from app.auth_cache import identity_cache
+from app.revocation import revocation_list
+from app.metrics import metrics
+from app.json_provider import FastJSONProvider
+from app.query_budget import query_guard, query_budget
+from app.conditional import track_table_versions
+
+
+# blueprint name in the BLUEPRINTS setting -> "module:attribute". Only the
+# blueprints a deployment lists are imported, when create_app runs.
+BLUEPRINT_MODULES = {
+    "auth": "app.controllers.auth_controller:auth",
+    "users": "app.controllers.users.user_controller:users",
+    "services": "app.controllers.services.service_controller:services",
+    "farmers": "app.controllers.farmer.farmer_controller:farmers",
+    "bookings": "app.controllers.booking.booking_controller:bookings",
+    "feedback": "app.controllers.feedback.feedback_controller:feedback",
+    "batch": "app.controllers.batch_controller:batch",
+}
+
+
+def register_blueprints(app):
+    for name in app.config.get("BLUEPRINTS", BLUEPRINT_MODULES):
+        if name not in BLUEPRINT_MODULES:
+            raise RuntimeError(f"unknown blueprint {name!r} in BLUEPRINTS, expected one of {sorted(BLUEPRINT_MODULES)}")
+        module_name, attribute = BLUEPRINT_MODULES[name].split(":")
+        app.register_blueprint(getattr(importlib.import_module(module_name), attribute))
+
+
+def init_cli(app):
+    # Flask-Migrate pulls in alembic, and the commands are only useful from
+    # the flask command, so none of it is loaded by the web workers
+    from flask_migrate import Migrate
+    from app.rating_stats import rebuild_rating_stats_command
+    from app.query_plans import check_query_plans_command
+    from app.seed import seed_command
+    from app.query_budget import check_query_budgets_command
+    from app.startup_profile import startup_profile_command
+
+    Migrate(app, db)
+    app.cli.add_command(rebuild_rating_stats_command)
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(check_query_budgets_command)
+    app.cli.add_command(startup_profile_command)
 
 
 
 
 
 #  Apllication Function factory: it builds and returns an instance of a Flask application
-def create_app():  # This is an application factory
+def create_app(config_overrides=None):  # This is an application factory
     app = Flask(__name__) # Initialize the Flask app
     app.config.from_object('config.Config')  # registering the database
+    if config_overrides:
+        app.config.update(config_overrides)  # e.g. a local sqlite database for benchmarks
+    app.json = FastJSONProvider(app)  # orjson when installed, ISO-8601 datetimes
 
 
+    replica_router.init_app(app)  # adds the replica binds, so it goes before db
     db.init_app(app) 
-    migrate.init_app(app, db) 
+    track_table_versions(app)  # list ETags
     jwt.init_app(app)
-    bcrypt.init_app(app)
+    identity_cache.init_app(app, jwt)  # current_user for @jwt_required routes
+    revocation_list.init_app(app, jwt)  # logged out tokens
+    service_catalog.init_app(app)
+    password_hasher.init_app(app)
+    user_search_index.init_app(app)
+    farmer_index.init_app(app)
+    feedback_buffer.init_app(app)
+    metrics.init_app(app, db)
+    query_guard.init_app(app, db)
 
     app.config['JWT_SECRET_KEY'] = 'HS256'
     
@@ -35,17 +91,19 @@ def create_app():  # This is an application factory
     from app.models.booking import Booking
     from app.models.feedback import Feedback
     from app.models.farmer import Farmer
+    from app.models.service_rating_stats import ServiceRatingStats
+    from app.models.revoked_token import RevokedToken
+    from app.models.table_version import TableVersion
     
 
 
- 
+    # cli commands and migrations, only when the app is loaded by the flask command
+    if click.get_current_context(silent=True) is not None:
+        init_cli(app)
+
+
 # register blueprints
-    app.register_blueprint(auth)
-    app.register_blueprint(users)
-    app.register_blueprint(services)
-    app.register_blueprint(farmers)
-    app.register_blueprint(bookings)
-    app.register_blueprint(feedback)
+    register_blueprints(app)
 
 
     
@@ -53,6 +111,7 @@ def create_app():  # This is an application factory
 
     # Define routes
     @app.route("/")
+    @query_budget(0)
     def home():
        return "Yucca Consulting Limited"
 
@@ -0,0 +1,211 @@
+import io
+import sys
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import jsonify
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.exceptions import HTTPException
+
+from app import create_app
+from app.status_codes import HTTP_200_OK, HTTP_400_BAD_REQUEST, HTTP_500_INTERNAL_SERVER_ERROR
+from app.pagination import InvalidPageRequest
+from app.projection import project_page_async, InvalidFieldsRequest
+from app.conditional import make_etag, not_modified, version_statement, with_validators
+from app.models.user import User
+from app.models.farmer import Farmer
+from app.models.booking import Booking
+from app.models.feedback import Feedback
+from app.controllers.users.user_controller import USER_LIST_FIELDS
+from app.controllers.farmer.farmer_controller import FARMER_LIST_FIELDS
+from app.controllers.booking.booking_controller import BOOKING_LIST_FIELDS
+from app.controllers.feedback.feedback_controller import FEEDBACK_LIST_FIELDS
+
+
+# ASGI entry point (asgi.py), the asyncio alternative to run.py.
+#
+# The list endpoints, where the time goes into waiting on the database, run
+# as coroutines on an async SQLAlchemy engine (aiomysql, or aiosqlite for a
+# sqlite uri) so one process can keep many of them in flight. They run inside
+# a normal Flask request context: request, config, jsonify, the JWT helpers
+# and the before/after_request hooks all work as in the sync app, and they
+# share the models, column schemas and pagination with it. Every other route
+# is handed to the Flask app itself through asgiref's WSGI adapter, which
+# runs it on a thread.
+#
+# Replica routing and the query guard / SQL metrics only see the sync
+# engines, the async engine always reads from SQLALCHEMY_DATABASE_URI.
+
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_uri(config):
+    uri = config.get("SQLALCHEMY_ASYNC_DATABASE_URI")
+    if uri:
+        return make_url(uri)
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+
+def wsgi_environ(scope):
+    # the WSGI environ of a body-less ASGI http request
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": "HTTP/" + scope.get("http_version", "1.1"),
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin1").upper().replace("-", "_")
+        key = name if name in ("CONTENT_TYPE", "CONTENT_LENGTH") else "HTTP_" + name
+        value = value.decode("latin1")
+        environ[key] = environ[key] + "," + value if key in environ else value
+    return environ
+
+
+# async handlers, same output as the sync views of the same endpoint
+
+async def list_users(session):
+    users_data, next_cursor = await project_page_async(session, USER_LIST_FIELDS, User.user_id)
+    return jsonify({
+        'message':"All users retrieved successfully",
+        "users":users_data,
+        "next_cursor":next_cursor
+    }),HTTP_200_OK
+
+
+async def list_farmers(session):
+    version = (await session.execute(version_statement("farmers"))).scalar() or 0
+    etag = make_etag("farmers", version)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    farmers_data, next_cursor = await project_page_async(session, FARMER_LIST_FIELDS, Farmer.farmer_id)
+    response = jsonify({
+        'message':"All farmers retrieved successfully",
+        "total_farmers":len(farmers_data),
+        "farmers":farmers_data,
+        "next_cursor":next_cursor
+    })
+    return with_validators(response, etag), HTTP_200_OK
+
+
+async def list_bookings(session):
+    bookings_data, next_cursor = await project_page_async(
+        session, BOOKING_LIST_FIELDS, Booking.booking_id, joins=[Booking.service])
+    return jsonify({
+        'message':"All bookings retrieved successfully",
+        "total_bookings":len(bookings_data),
+        "bookings":bookings_data,
+        "next_cursor":next_cursor
+    }), HTTP_200_OK
+
+
+async def list_feedbacks(session):
+    output, next_cursor = await project_page_async(session, FEEDBACK_LIST_FIELDS, Feedback.feedback_id)
+    return jsonify({
+        'feedbacks': output,
+        'next_cursor': next_cursor
+    }), HTTP_200_OK
+
+
+# flask endpoint name -> async handler, GET/HEAD only
+ASYNC_HANDLERS = {
+    "users.getAllusers": list_users,
+    "farmer.get_All_farmers": list_farmers,
+    "booking.getAllbookings": list_bookings,
+    "feedback.get_all_feedbacks": list_feedbacks,
+}
+
+
+class AsyncApp:
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+
+        url = async_database_uri(flask_app.config)
+        options = {}
+        if not url.drivername.startswith("sqlite"):
+            options = {"pool_size": flask_app.config.get("ASYNC_DB_POOL_SIZE", 20), "pool_recycle": 3600}
+        self.engine = create_async_engine(url, **options)
+        self.sessionmaker = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+
+        handler = None
+        if scope["type"] == "http" and scope["method"] in ("GET", "HEAD"):
+            environ = wsgi_environ(scope)
+            handler = self._handler_for(environ)
+
+        if handler is None:
+            return await self.wsgi(scope, receive, send)
+
+        response = await self._run(handler, environ)
+        await self._send(scope, send, response)
+
+    def _handler_for(self, environ):
+        try:
+            endpoint, _ = self.flask_app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            # 404s, 405s and slash redirects are left to flask
+            return None
+        return ASYNC_HANDLERS.get(endpoint)
+
+    async def _run(self, handler, environ):
+        app = self.flask_app
+        with app.request_context(environ):
+            response = app.preprocess_request()
+            if response is None:
+                try:
+                    async with self.sessionmaker() as session:
+                        response = await handler(session)
+                except (InvalidPageRequest, InvalidFieldsRequest) as e:
+                    response = jsonify({"error":str(e)}), HTTP_400_BAD_REQUEST
+                except Exception as e:
+                    response = jsonify({"error":str(e)}), HTTP_500_INTERNAL_SERVER_ERROR
+
+            response = app.make_response(response)
+            return app.process_response(response)
+
+    async def _send(self, scope, send, response):
+        headers = [(name.lower().encode("latin1"), value.encode("latin1"))
+                   for name, value in response.headers.items()]
+        await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+        body = b"" if scope["method"] == "HEAD" else response.get_data()
+        await send({"type": "http.response.body", "body": body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def create_asgi_app(config_overrides=None):
+    return AsyncApp(create_app(config_overrides))
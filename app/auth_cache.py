@@ -0,0 +1,187 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app
+from flask_jwt_extended import JWTManager
+from flask_jwt_extended.config import config
+
+
+# Caches for the authenticated side of a request.
+#
+# ClaimsCache: every @jwt_required() route used to base64-decode the token and
+# verify its HMAC signature again. Verified claims are now kept in an LRU keyed
+# by a digest of the token (and the signing secret), until the token's exp, so
+# a client reusing its access token only pays a dict lookup. The blocklist and
+# token type checks still run on every request, only the decode is skipped.
+#
+# IdentityCache: the logged-in user as loaded by the user_lookup_loader. The
+# loader itself costs nothing, current_user.id comes from the token; the
+# profile is loaded on first use, at most once per request, from a short TTL
+# cache shared by the worker's threads. Writes to a user call invalidate().
+# Other workers catch up within IDENTITY_CACHE_TTL seconds.
+
+UserProfile = namedtuple("UserProfile", [
+    "user_id", "first_name", "last_name", "email", "contact", "user_type", "created_at", "updated_at",
+])
+
+
+class ClaimsCache:
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, encoded_token):
+        secret = current_app.config.get("JWT_SECRET_KEY") or ""
+        return hashlib.sha256(f"{secret}\0{encoded_token}".encode()).digest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, claims = entry
+            # expired tokens go through the full decode, which raises the
+            # usual ExpiredSignatureError
+            if expires is not None and time.time() >= expires:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return dict(claims)
+
+    def put(self, key, claims, leeway=0):
+        if not self.max_size:
+            return
+        expires = claims["exp"] + leeway if "exp" in claims else None
+        with self._lock:
+            self._entries[key] = (expires, dict(claims))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class CachingJWTManager(JWTManager):
+    # JWTManager that remembers the tokens it has already verified
+
+    def __init__(self, *args, **kwargs):
+        self.claims_cache = ClaimsCache()
+        super().__init__(*args, **kwargs)
+
+    def init_app(self, app, *args, **kwargs):
+        super().init_app(app, *args, **kwargs)
+        self.claims_cache.max_size = app.config.get("JWT_CLAIMS_CACHE_SIZE", self.claims_cache.max_size)
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        # cookie tokens carry a csrf value to check and allow_expired is only
+        # used by the error handlers, both always take the full path
+        if csrf_value is not None or allow_expired or not self.claims_cache.max_size:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        key = self.claims_cache.key(encoded_token)
+        claims = self.claims_cache.get(key)
+        if claims is None:
+            claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+            self.claims_cache.put(key, claims, int(config.leeway))
+        return claims
+
+
+class CurrentUser:
+    # what flask_jwt_extended.current_user returns, one per request
+
+    def __init__(self, user_id, cache):
+        self.id = user_id
+        self._cache = cache
+        self._profile = None
+        self._loaded = False
+
+    @property
+    def profile(self):
+        # UserProfile, or None when the user no longer exists
+        if not self._loaded:
+            self._profile = self._cache.get(self.id)
+            self._loaded = True
+        return self._profile
+
+    def __repr__(self):
+        return f"<CurrentUser {self.id}>"
+
+
+class IdentityCache:
+
+    def __init__(self, ttl=30, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._invalidations = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app, jwt):
+        self.ttl = app.config.get("IDENTITY_CACHE_TTL", self.ttl)
+
+        @jwt.user_lookup_loader
+        def load_current_user(jwt_header, jwt_data):
+            return CurrentUser(int(jwt_data[config.identity_claim_key]), self)
+
+    def _load(self, user_id):
+        from app.extensions import db
+        from app.models.user import User
+
+        row = db.session.execute(
+            db.select(*(getattr(User, field) for field in UserProfile._fields)).where(User.user_id == user_id)
+        ).first()
+        return UserProfile(*row) if row is not None else None
+
+    def get(self, user_id, fresh=False):
+        # fresh=True skips the cached entry and reads the row, e.g. right
+        # after a write to answer with what was committed
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if not fresh and entry is not None and now - entry[0] < self.ttl:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            invalidations = self._invalidations
+
+        profile = self._load(user_id)
+        if profile is not None and self.ttl:
+            with self._lock:
+                # an invalidate() while we were loading may mean the row is stale
+                if invalidations != self._invalidations:
+                    return profile
+                self._entries[user_id] = (now, profile)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return profile
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._invalidations += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+identity_cache = IdentityCache()
@@ -0,0 +1,116 @@
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from flask import current_app
+
+from app.db_routing import use_primary
+from app.json_provider import Fragment
+
+
+# In-process read-through cache of the whole service catalog.
+# The catalog is small and changes a few times a day, so every worker keeps
+# an immutable snapshot of it and serves the service reads from memory.
+# Writes bump the version, which drops the snapshot; the next read reloads it.
+# The snapshot also carries what the conditional GET validators are built
+# from (a digest of the whole catalog for the list, the encoded service for
+# the detail route), so a 304 costs no query at all, and every service
+# already encoded as a JSON Fragment that responses splice in.
+
+CatalogSnapshot = namedtuple("CatalogSnapshot", [
+    "version", "loaded_at", "ids", "items", "by_id",
+    "encoded", "encoded_by_id", "digest",
+])
+
+
+def serialize_service(service):
+    return {
+        "id":service.service_id,
+        "name":service.name,
+        "price":service.price,
+        "description":service.description,
+        "created_at":service.created_at
+    }
+
+
+class ServiceCatalogCache:
+
+    def __init__(self, ttl=None):
+        # ttl is a safety net for writes made by other worker processes,
+        # None means the snapshot only expires on invalidate()
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.get("SERVICE_CACHE_TTL", self.ttl)
+
+    def _is_fresh(self, snapshot):
+        if snapshot is None or snapshot.version != self.version:
+            return False
+        if self.ttl is not None and time.monotonic() - snapshot.loaded_at > self.ttl:
+            return False
+        return True
+
+    def _load(self, version):
+        from app.models.service import Service
+
+        # a lagging replica would keep an old catalog cached until the next write
+        with use_primary():
+            # full_scan: the whole table on purpose, check-query-plans skips it
+            services = Service.query.order_by(Service.service_id).execution_options(full_scan=True).all()
+        items = tuple(serialize_service(service) for service in services)
+        ids = tuple(item["id"] for item in items)
+        encoded = tuple(Fragment(current_app.json.dumps(item)) for item in items)
+
+        return CatalogSnapshot(
+            version=version,
+            loaded_at=time.monotonic(),
+            ids=ids,
+            items=items,
+            by_id=MappingProxyType(dict(zip(ids, items))),
+            encoded=encoded,
+            encoded_by_id=MappingProxyType(dict(zip(ids, encoded))),
+            # changes with any change to what the list shows
+            digest=hashlib.sha1(b"\n".join(fragment.contents for fragment in encoded)).hexdigest(),
+        )
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            self.hits += 1
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if self._is_fresh(snapshot):
+                self.hits += 1
+                return snapshot
+
+            self.misses += 1
+            self._snapshot = self._load(self.version)
+            return self._snapshot
+
+    def invalidate(self):
+        # taking the lock means a reload that is in flight finishes first
+        # and is then thrown away, so a stale snapshot can never survive
+        with self._lock:
+            self.version += 1
+            self._snapshot = None
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(snapshot.items) if snapshot is not None else 0,
+        }
+
+
+service_catalog = ServiceCatalogCache()
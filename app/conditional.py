@@ -0,0 +1,84 @@
+import hashlib
+
+from flask import Response, request
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.status_codes import HTTP_304_NOT_MODIFIED
+
+
+# Conditional GET for the list and detail endpoints.
+#
+# A list's ETag comes from its table version, a counter in table_versions
+# that every INSERT, UPDATE and DELETE on the table bumps in the same
+# transaction: reading it is a primary key lookup, and unlike the row count
+# and newest updated_at it moves on every write, deletes and two writes in
+# the same second included. The detail routes hash what they return, the
+# row they have loaded anyway. Only If-None-Match is honored, a date can't
+# tell that a row was deleted or changed twice in a second. The ETag of a
+# response hashes its parts together with the request path and query
+# string, so every page of a list has its own tag. When the client already
+# has the current version not_modified() returns a 304 before any rows are
+# loaded or serialized.
+
+# tables with a version. Writes are counted for every engine when they are
+# SQLAlchemy statements (ORM, core, the seeder); raw SQL text is not seen,
+# bump table_versions by hand next to it.
+VERSIONED_TABLES = ("farmers",)
+
+
+def version_statement(table_name):
+    from app.models.table_version import TableVersion
+
+    return select(TableVersion.version).where(TableVersion.name == table_name)
+
+
+def table_version(table_name):
+    return db.session.execute(version_statement(table_name)).scalar() or 0
+
+
+def _bump(connection, table_name):
+    from app.models.table_version import TableVersion
+
+    stmt = update(TableVersion).where(TableVersion.name == table_name).values(version=TableVersion.version + 1)
+    if connection.execute(stmt).rowcount:
+        return
+
+    # no row yet (a database made with create_all), create it; if another
+    # write created it in the meantime fall back to the update
+    try:
+        with connection.begin_nested():
+            connection.execute(insert(TableVersion).values(name=table_name, version=1))
+    except IntegrityError:
+        connection.execute(stmt)
+
+
+def track_table_versions(app):
+    def after_execute(connection, clauseelement, multiparams, params, execution_options, result):
+        table = getattr(clauseelement, "table", None)
+        if getattr(clauseelement, "is_dml", False) and getattr(table, "name", None) in VERSIONED_TABLES:
+            _bump(connection, table.name)
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "after_execute", after_execute)
+
+
+def make_etag(*parts):
+    key = "|".join(str(part) for part in parts + (request.full_path,))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def not_modified(etag):
+    # returns a 304 response when the client copy is current, otherwise None
+    if not request.if_none_match.contains(etag):
+        return None
+
+    response = Response(status=HTTP_304_NOT_MODIFIED)
+    return with_validators(response, etag)
+
+
+def with_validators(response, etag):
+    response.set_etag(etag)
+    return response
@@ -1,11 +1,18 @@
 
 from flask import Blueprint, request, jsonify
-from app.status_codes import HTTP_400_BAD_REQUEST, HTTP_409_CONFLICT, HTTP_500_INTERNAL_SERVER_ERROR, HTTP_201_CREATED, HTTP_401_UNAUTHORIZED, HTTP_200_OK
-import validators
+from app.status_codes import HTTP_400_BAD_REQUEST, HTTP_409_CONFLICT, HTTP_500_INTERNAL_SERVER_ERROR, HTTP_201_CREATED, HTTP_401_UNAUTHORIZED, HTTP_200_OK, HTTP_503_SERVICE_UNAVAILABLE
 from app.models.user import User
-from app.extensions import db, bcrypt
+from app.extensions import db
+from app.passwords import password_hasher, HashingPoolBusy
+from app.user_search import user_search_index
+from app.query_budget import query_budget
+from app.integrity import unique_violation
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 from flask_jwt_extended import create_access_token, create_refresh_token
-from flask_jwt_extended import get_jwt_identity, jwt_required
+from flask_jwt_extended import get_jwt_identity, jwt_required, get_jwt, decode_token
+from app.models.revoked_token import RevokedToken
+from app.revocation import revocation_list, token_expiry
 
 # Auth blueprint
 auth = Blueprint('auth', __name__, url_prefix='/api/v1/auth')
@@ -14,6 +21,7 @@ auth = Blueprint('auth', __name__, url_prefix='/api/v1/auth')
 #User registration
 
 @auth.route('/register' , methods=['POST'])
+@query_budget(3)
 def register_user():
     #Storing request values
     data = request.json
@@ -32,22 +40,31 @@ def register_user():
     if len(password) < 8:
         return({"error":'The password is too short'}),HTTP_400_BAD_REQUEST
     
+    import validators  # only needed here, kept off the import path of the app
+
     if not validators.email(email):
         return({"error":"Email is not valid"}),HTTP_400_BAD_REQUEST
     
-    if User.query.filter_by(email=email).first() is not None:
-        return({"error":"Email address in use"}),HTTP_409_CONFLICT
-    
-    if User.query.filter_by(contact=contact).first() is not None:
-        return({"error":"Number is already in use"}),HTTP_409_CONFLICT
-    
+    # email and contact are unique keys, the INSERT itself finds duplicates;
+    # the common repeat registration is turned away by one indexed read
+    # first, before it costs a password hash
     try:
-        hashed_password = bcrypt.generate_password_hash(password)# Hashing the password
+        # one row per clash, true when it is the email (compared by the database, with its collation)
+        taken = db.session.execute(
+            db.select(User.email == email).where(or_(User.email == email, User.contact == contact)).limit(2)
+        ).scalars().all()
+        if any(taken):
+            return({"error":"Email address in use"}),HTTP_409_CONFLICT
+        if taken:
+            return({"error":"Number is already in use"}),HTTP_409_CONFLICT
+
+        hashed_password = password_hasher.generate_password_hash(password)# Hashing the password in the worker pool
 
         #Creating the user
         new_user = User(first_name=first_name,last_name=last_name,password=hashed_password,email=email,contact=contact,user_type=user_type)
         db.session.add(new_user)
         db.session.commit()
+        user_search_index.add_user(new_user)
         #User name
         username = new_user.get_full_name()
 
@@ -65,12 +82,24 @@ def register_user():
         }),HTTP_201_CREATED
 
 
+    except HashingPoolBusy as e:
+        return jsonify ({"error":str(e)}),HTTP_503_SERVICE_UNAVAILABLE
+
+    except IntegrityError as e:
+        db.session.rollback()
+        if unique_violation(e, "email", User.email):
+            return({"error":"Email address in use"}),HTTP_409_CONFLICT
+        if unique_violation(e, "ix_users_contact", User.contact):
+            return({"error":"Number is already in use"}),HTTP_409_CONFLICT
+        return jsonify ({"error":str(e)}),HTTP_500_INTERNAL_SERVER_ERROR
+
     except Exception as e:
         db.session.rollback()
         return jsonify ({"error":str(e)}),HTTP_500_INTERNAL_SERVER_ERROR
     
 # User login
 @auth.post('/login')
+@query_budget(2)
 def login():
     email = request.json.get('email')
     password = request.json.get('password')
@@ -82,9 +111,14 @@ def login():
         user = User.query.filter_by(email=email).first()
 
         if user:
-            is_correct_password = bcrypt.check_password_hash(user.password, password)
+            is_correct_password = password_hasher.check_password_hash(user.password, password)
 
             if is_correct_password:
+                # upgrade hashes made with an older, cheaper cost while we have the password
+                if password_hasher.needs_rehash(user.password):
+                    user.password = password_hasher.generate_password_hash(password)
+                    db.session.commit()
+
                 access_token = create_access_token(identity=str(user.user_id))
                 refresh_token = create_refresh_token(identity=str(user.user_id))
 
@@ -104,15 +138,61 @@ def login():
         else:
             return jsonify({'Message': "Invalid email address"}), HTTP_401_UNAUTHORIZED
 
+    except HashingPoolBusy as e:
+        return jsonify({'error': str(e)}), HTTP_503_SERVICE_UNAVAILABLE
+
     except Exception as e:
         return jsonify({'error': str(e)}), HTTP_500_INTERNAL_SERVER_ERROR
 
 
 # We are using the `refresh=True` options in jwt_required to only allow refresh tokens to access this route.
 @auth.route("/token/refresh", methods=["POST"])
+@query_budget(0)
 @jwt_required(refresh=True)
 def refresh():
     identity = get_jwt_identity()
     access_token = create_access_token(identity=str(identity))
     return jsonify({'access_token': access_token})
 
+
+#logout, the token it is called with (and the refresh token, if sent) stop working
+@auth.route("/logout", methods=["POST"])
+@query_budget(2)
+@jwt_required(verify_type=False)
+def logout():
+    try:
+        tokens = [get_jwt()]
+
+        refresh_token = (request.get_json(silent=True) or {}).get('refresh_token')
+        if refresh_token:
+            try:
+                decoded = decode_token(refresh_token)
+            except Exception:
+                return jsonify({'error': "refresh_token is not valid"}), HTTP_400_BAD_REQUEST
+            if decoded.get('type') != 'refresh' or decoded['sub'] != tokens[0]['sub']:
+                return jsonify({'error': "refresh_token is not valid"}), HTTP_400_BAD_REQUEST
+            if not revocation_list.is_revoked(decoded['jti']):
+                tokens.append(decoded)
+
+        for token in tokens:
+            db.session.add(RevokedToken(
+                jti=token['jti'],
+                token_type=token['type'],
+                user_id=int(token['sub']),
+                expires_at=token_expiry(token),
+            ))
+        db.session.commit()
+
+        for token in tokens:
+            revocation_list.add(token['jti'], token_expiry(token))
+
+        return jsonify({'message': "You have been logged out."}), HTTP_200_OK
+
+    except IntegrityError:
+        # logged out twice at the same time
+        db.session.rollback()
+        return jsonify({'message': "You have been logged out."}), HTTP_200_OK
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), HTTP_500_INTERNAL_SERVER_ERROR
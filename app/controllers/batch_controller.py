@@ -0,0 +1,114 @@
+from flask import Blueprint, request, jsonify, current_app, g
+from flask_jwt_extended import verify_jwt_in_request
+from werkzeug.test import EnvironBuilder
+from app.status_codes import HTTP_400_BAD_REQUEST, HTTP_200_OK, HTTP_500_INTERNAL_SERVER_ERROR
+from app.query_budget import query_budget, route_budget
+from app.json_provider import Fragment
+from app.extensions import db
+
+# Batch blueprint: several API calls in one round trip, for clients on slow
+# links. Every sub-request is matched against the app's URL map and runs its
+# view in this request's app context, so they all share the caller's token
+# (verified once here), g and one database session. The before/after request
+# hooks (metrics, query guard, replica routing) see the batch as one request.
+batch = Blueprint('batch', __name__, url_prefix='/api/v1')
+
+# headers of the batch request passed on to every sub-request
+FORWARDED_HEADERS = {"authorization", "cookie", "accept-language", "user-agent"}
+# headers of a sub-response returned with its body
+RETURNED_HEADERS = ["ETag", "Location"]
+
+
+class InvalidBatchRequest(ValueError):
+    pass
+
+
+def parse_sub_request(item):
+    if not isinstance(item, dict):
+        raise InvalidBatchRequest("each request must be an object with a method and a path")
+
+    method = str(item.get("method", "GET")).upper()
+    path = item.get("path")
+    if not isinstance(path, str) or not path.startswith("/api/"):
+        raise InvalidBatchRequest("each request needs a path starting with /api/")
+    if path.split("?")[0].rstrip("/") == request.path.rstrip("/"):
+        raise InvalidBatchRequest("batches can't be nested")
+
+    headers = item.get("headers") or {}
+    if not isinstance(headers, dict):
+        raise InvalidBatchRequest("headers must be an object")
+    return method, path, headers, item.get("body")
+
+
+def dispatch(method, path, headers, body):
+    forwarded = {name: value for name, value in request.headers if name.lower() in FORWARDED_HEADERS}
+    forwarded.update(headers)
+    builder = EnvironBuilder(
+        path=path,
+        method=method,
+        headers=forwarded,
+        json=body,
+        environ_base={"REMOTE_ADDR": request.remote_addr},
+    )
+
+    # the app context is already pushed, so the sub-request reuses it
+    with current_app.request_context(builder.get_environ()):
+        try:
+            rv = current_app.dispatch_request()
+        except Exception as e:
+            try:
+                rv = current_app.handle_user_exception(e)
+            except Exception as unhandled:
+                rv = jsonify({"error": str(unhandled)}), HTTP_500_INTERNAL_SERVER_ERROR
+        response = current_app.make_response(rv)
+
+        # most views answer their own errors with a 500 and leave the session
+        # as it was; the next sub-request gets a clean one
+        if not db.session.is_active or response.status_code >= HTTP_500_INTERNAL_SERVER_ERROR:
+            db.session.rollback()
+
+        if response.is_streamed:
+            # an export would be read whole into the batch response, its body
+            # has not run yet and is dropped
+            response.close()
+            return {"status": HTTP_400_BAD_REQUEST, "body": {"error": "streamed responses (exports) can't be batched"}}
+
+        budget = route_budget(current_app, request.endpoint)
+        data = response.get_data()
+
+    g.query_budget_extra = g.get("query_budget_extra", 0) + (budget or 0)
+
+    result = {"status": response.status_code}
+    returned = {name: response.headers[name] for name in RETURNED_HEADERS if name in response.headers}
+    if returned:
+        result["headers"] = returned
+    if response.is_json and data.strip():
+        result["body"] = Fragment(data.strip())  # already JSON, spliced in as is
+    elif data:
+        result["body"] = data.decode("utf-8", "replace")
+    return result
+
+
+#run several requests, the body is a list of {"method", "path", "body", "headers"}
+@batch.route('/batch', methods=["POST"])
+@query_budget(0)
+def run_batch():
+    try:
+        items = request.get_json(silent=True)
+        max_requests = current_app.config.get("BATCH_MAX_REQUESTS", 20)
+
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': "the body must be a list of requests"}), HTTP_400_BAD_REQUEST
+        if len(items) > max_requests:
+            return jsonify({'error': f"at most {max_requests} requests per batch"}), HTTP_400_BAD_REQUEST
+
+        sub_requests = [parse_sub_request(item) for item in items]
+
+        # a bad or revoked token fails the batch once instead of once per entry
+        verify_jwt_in_request(optional=True)
+
+        responses = [dispatch(*sub_request) for sub_request in sub_requests]
+        return jsonify({'responses': responses}), HTTP_200_OK
+
+    except InvalidBatchRequest as e:
+        return jsonify({'error': str(e)}), HTTP_400_BAD_REQUEST
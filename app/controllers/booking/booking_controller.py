@@ -1,15 +1,42 @@
 from flask import Blueprint, request, jsonify
 from app.models.booking import Booking, db
-from app.extensions import bcrypt, jwt
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.status_codes import HTTP_400_BAD_REQUEST, HTTP_201_CREATED, HTTP_404_NOT_FOUND, HTTP_500_INTERNAL_SERVER_ERROR, HTTP_200_OK,HTTP_403_FORBIDDEN
+from app.pagination import InvalidPageRequest
+from app.export import export_response, InvalidExportRequest
+from app.query_budget import query_budget
+from app.integrity import unique_violation
+from sqlalchemy.exc import IntegrityError
+from app.projection import project_page, InvalidFieldsRequest
+from app.multi_get import get_ids_arg, in_request_order, InvalidIdsRequest
+from app.models.service import Service
+from sqlalchemy.orm import joinedload
 
 
 # Create a  booking blueprint
 bookings = Blueprint('booking', __name__, url_prefix='/api/v1/bookings')
 
+
+# Bookings are always serialized together with their service and user, so
+# load them in the same SELECT instead of one query per row.
+def booking_query():
+    return Booking.query.options(joinedload(Booking.service), joinedload(Booking.user))
+
+
+# output of the booking list, the service fields come from an outer join
+BOOKING_LIST_FIELDS = [
+    ("id", Booking.booking_id),
+    ("status", Booking.status),
+    ("service.id", Service.service_id),
+    ("service.name", Service.name),
+    ("service.price", Service.price),
+    ("service.description", Service.description),
+]
+
+
 # Define the create booking endpoint
 @bookings.route('/create', methods=["POST"])
+@query_budget(2)
 @jwt_required()
 def createbooking():
     try:
@@ -24,9 +51,7 @@ def createbooking():
         if not status or not service_id:
             return jsonify({'error': "All fields are required"}), HTTP_400_BAD_REQUEST
 
-        # Check if book name already exists
-        if Booking.query.filter_by(status=status, user_id=user_id).first() is not None:
-            return jsonify({'error': 'booking with this status and user id already exists'}), HTTP_400_BAD_REQUEST
+        # (user_id, status) is a unique key, a duplicate fails on the INSERT
         
         # if Book.query.filter_by(generation=generation).first() is not None:
         #     return jsonify({'error': 'book generation already exists'}), HTTP_400_BAD_REQUEST
@@ -43,8 +68,13 @@ def createbooking():
 
         # Adding the new booking instance to the database session
         db.session.add(new_booking)
+        db.session.flush()
+        booking_id = new_booking.booking_id
         db.session.commit()
 
+        # reload it with the service and user in one query
+        new_booking = booking_query().filter_by(booking_id=booking_id).first()
+
         # Return a success response with the newly created booking details
         return jsonify({
             'message':  status + " has been created successfully",
@@ -73,6 +103,12 @@ def createbooking():
             }
         }), HTTP_201_CREATED
 
+    except IntegrityError as e:
+        db.session.rollback()
+        if unique_violation(e, "ix_bookings_user_id_status", Booking.user_id, Booking.status):
+            return jsonify({'error': 'booking with this status and user id already exists'}), HTTP_400_BAD_REQUEST
+        return jsonify({'error': str(e)}), HTTP_500_INTERNAL_SERVER_ERROR
+
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), HTTP_500_INTERNAL_SERVER_ERROR
@@ -82,83 +118,121 @@ def createbooking():
 #getting all bookings
 
 @bookings.get('/')
+@query_budget(1)
 def getAllbookings():
 
     try:
-        all_bookings = Booking.query.all()
-
-        bookings_data = []
-        for booking in all_bookings:
-            booking_info = {
-                    "id":booking.booking_id,
-                'status':booking.status,
-            
-            "service":{
-                       
-                'id': booking.service.service_id,
-                'name': booking.service.name,
-                'price': booking.service.price,
-                'description': booking.service.description,
-            },
-
-            }
-
-            bookings_data.append(booking_info)
-
+        bookings_data, next_cursor = project_page(BOOKING_LIST_FIELDS, Booking.booking_id, joins=[Booking.service])
 
         return jsonify({
                 'message':"All bookings retrieved successfully",
             "total_bookings":len(bookings_data),
-            "bookings":bookings_data
+            "bookings":bookings_data,
+            "next_cursor":next_cursor
         }),  HTTP_200_OK
         
     
+    except (InvalidPageRequest, InvalidFieldsRequest) as e:
+        return jsonify({
+            "error":str(e)
+        }),HTTP_400_BAD_REQUEST
+
     except Exception as e:
         return jsonify({
             "error":str(e)
         }),HTTP_500_INTERNAL_SERVER_ERROR
     
 
+#exporting all bookings
+
+@bookings.get('/export')
+@query_budget(1)
+@jwt_required()
+def export_bookings():
+    try:
+        return export_response("bookings", [
+            ("id", Booking.booking_id),
+            ("status", Booking.status),
+            ("user_id", Booking.user_id),
+            ("service_id", Booking.service_id),
+            ("created_at", Booking.created_at),
+        ], Booking.booking_id)
+
+    except InvalidExportRequest as e:
+        return jsonify({
+            "error":str(e)
+        }),HTTP_400_BAD_REQUEST
+
+
+def booking_details(booking):
+    return {
+        "id":booking.booking_id,
+        'status':booking.status,
+
+        "service":{
+            'id': booking.service.service_id,
+            'name': booking.service.name,
+            'price': booking.service.price,
+            'description': booking.service.description,
+        },
+
+        "user":{
+            "first_name":booking.user.first_name,
+            "last_name":booking.user.last_name,
+            "username":booking.user.get_full_name(),
+            "email":booking.user.email,
+            "contact":booking.user.contact,
+            "type":booking.user.user_type,
+            "created_at":booking.user.created_at,
+        }
+    }
+
+
     #getting booking by id
 @bookings.get('/booking/<int:id>')
+@query_budget(1)
 @jwt_required()
 def getbooking(id):
 
     try:
-        booking = Booking.query.filter_by(booking_id=id).first()
+        booking = booking_query().filter_by(booking_id=id).first()
 
       
 
         return jsonify({
             "message":"booking details retrieved successfully",
-            "booking":{
-              
-                   "id":booking.booking_id,
-                'status':booking.status,
-            
-            "service":{
-                       
-                'id': booking.service.service_id,
-                'name': booking.service.name,
-                'price': booking.service.price,
-                'description': booking.service.description,
-            },
-
-            "user":{
-                 "first_name":booking.user.first_name,
-                "last_name":booking.user.last_name,
-                "username":booking.user.get_full_name(),
-                "email":booking.user.email,
-                "contact":booking.user.contact,
-                "type":booking.user.user_type,
-                "created_at":booking.user.created_at,
-            }
-            }
+            "booking":booking_details(booking)
         })  ,HTTP_200_OK
     
     except Exception as e:
         return jsonify({
             "error":str(e)
         }),HTTP_500_INTERNAL_SERVER_ERROR
+
+
+#getting several bookings by id, /booking?ids=1,2,3
+@bookings.get('/booking')
+@query_budget(1)
+@jwt_required()
+def getbookings():
+
+    try:
+        ids = get_ids_arg()
+        found = {booking.booking_id: booking_details(booking) for booking in booking_query().filter(Booking.booking_id.in_(ids))}
+        items, missing = in_request_order(ids, found)
+
+        return jsonify({
+            "message":"booking details retrieved successfully",
+            "bookings":items,
+            "missing":missing
+        })  ,HTTP_200_OK
+
+    except InvalidIdsRequest as e:
+        return jsonify({'error': str(e)}), HTTP_400_BAD_REQUEST
+
+    except Exception as e:
+        return jsonify({
+            "error":str(e)
+        }),HTTP_500_INTERNAL_SERVER_ERROR
     
     
\ No newline at end of file
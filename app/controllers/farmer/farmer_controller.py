@@ -1,15 +1,33 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from app.models.farmer import Farmer , db
-from app.extensions import bcrypt, jwt
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity, current_user
 from app.status_codes import HTTP_400_BAD_REQUEST, HTTP_201_CREATED, HTTP_404_NOT_FOUND, HTTP_500_INTERNAL_SERVER_ERROR, HTTP_200_OK,HTTP_403_FORBIDDEN
+from app.pagination import paginate_sorted, InvalidPageRequest
+from app.farmer_index import farmer_index
+from app.export import export_response, InvalidExportRequest
+from app.query_budget import query_budget
+from app.integrity import unique_violation
+from sqlalchemy.exc import IntegrityError
+from app.conditional import make_etag, not_modified, table_version, with_validators
+from app.projection import project_page, InvalidFieldsRequest
+from app.multi_get import get_ids_arg, in_request_order, InvalidIdsRequest
 
 
 # Create a  farmer blueprint
 farmers = Blueprint('farmer', __name__, url_prefix='/api/v1/farmers')
 
+# output of the farmer list
+FARMER_LIST_FIELDS = [
+    ("id", Farmer.farmer_id),
+    ("name", Farmer.name),
+    ("location", Farmer.location),
+    ("crops_grown", Farmer.crops_grown),
+    ("created_at", Farmer.created_at),
+]
+
 # Define and  create farmer endpoint
 @farmers.route('/create', methods=["POST"])
+@query_budget(3)
 @jwt_required()
 def create_farmer():
     try:
@@ -23,11 +41,8 @@ def create_farmer():
         if not name or not location or not crops_grown :
             return jsonify({'error': "All fields are required"}), HTTP_400_BAD_REQUEST
 
-        # Check if farmer name already exists
-        if Farmer.query.filter_by(name=name).first() is not None:
-            return jsonify({'error': 'farmer name already exists'}), HTTP_400_BAD_REQUEST
-
-        # Creating a new farmer 
+        # Creating a new farmer, the name is a unique key so a duplicate
+        # fails on the INSERT 
         new_farmer = Farmer(
             name=name,
             location=location,
@@ -37,6 +52,7 @@ def create_farmer():
         # Adding the new farmer instance to the database session
         db.session.add(new_farmer)
         db.session.commit()
+        farmer_index.add_farmer(new_farmer)
 
         # Return a success response with the newly created farmer details
         return jsonify({
@@ -50,6 +66,12 @@ def create_farmer():
             }
         }), HTTP_201_CREATED
 
+    except IntegrityError as e:
+        db.session.rollback()
+        if unique_violation(e, "ix_farmers_name", Farmer.name):
+            return jsonify({'error': 'farmer name already exists'}), HTTP_400_BAD_REQUEST
+        return jsonify({'error': str(e)}), HTTP_500_INTERNAL_SERVER_ERROR
+
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), HTTP_500_INTERNAL_SERVER_ERROR
@@ -58,59 +80,170 @@ def create_farmer():
 #getting all farmers
 
 @farmers.get('/')
+@query_budget(2)
 def get_All_farmers():
 
     try:
-        all_farmers = Farmer.query.all()
+        etag = make_etag("farmers", table_version("farmers"))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        farmers_data, next_cursor = project_page(FARMER_LIST_FIELDS, Farmer.farmer_id)
+
+        response = jsonify({
+                'message':"All farmers retrieved successfully",
+            "total_farmers":len(farmers_data),
+            "farmers":farmers_data,
+            "next_cursor":next_cursor
+        })
+        return with_validators(response, etag),  HTTP_200_OK
+        
+    
+    except (InvalidPageRequest, InvalidFieldsRequest) as e:
+        return jsonify({
+            "error":str(e)
+        }),HTTP_400_BAD_REQUEST
+
+    except Exception as e:
+        return jsonify({
+            "error":str(e)
+        }),HTTP_500_INTERNAL_SERVER_ERROR
+
+
+#exporting all farmers
+
+@farmers.get('/export')
+@query_budget(1)
+@jwt_required()
+def export_farmers():
+    try:
+        return export_response("farmers", [
+            ("id", Farmer.farmer_id),
+            ("name", Farmer.name),
+            ("location", Farmer.location),
+            ("crops_grown", Farmer.crops_grown),
+            ("created_at", Farmer.created_at),
+        ], Farmer.farmer_id)
+
+    except InvalidExportRequest as e:
+        return jsonify({
+            "error":str(e)
+        }),HTTP_400_BAD_REQUEST
+
+
+#searching farmers by crop and location
+
+@farmers.get('/search')
+@query_budget(2)
+@jwt_required()
+def search_farmers():
+
+    try:
+        crop = request.args.get('crop')
+        location = request.args.get('location')
+
+        # matching ids and facet counts come from the crop/location index
+        farmer_ids, crop_counts, location_counts = farmer_index.search(crop=crop, location=location)
+        page_ids, next_cursor = paginate_sorted(farmer_ids, farmer_ids)
+
+        found = {farmer.farmer_id: farmer for farmer in Farmer.query.filter(Farmer.farmer_id.in_(page_ids)).all()}
 
         farmers_data = []
-        for farmer in all_farmers:
-            farmer_info = {
+        for farmer_id in page_ids:
+            farmer = found.get(farmer_id)
+            if farmer is None:
+                continue
+            farmers_data.append({
                 "id":farmer.farmer_id,
                 "name":farmer.name,
                 "location":farmer.location,
-                "crops_grown":farmer.crops_grown,              
+                "crops_grown":farmer.crops_grown,
                 "created_at":farmer.created_at
-            }
-
-            farmers_data.append(farmer_info)
-
+            })
 
         return jsonify({
-                'message':"All farmers retrieved successfully",
-            "total_farmers":len(farmers_data),
-            "farmers":farmers_data
+            'message':"farmers retrieved successfully",
+            "total_farmers":len(farmer_ids),
+            "farmers":farmers_data,
+            "facets":{
+                "crops":crop_counts,
+                "locations":location_counts
+            },
+            "next_cursor":next_cursor
         }),  HTTP_200_OK
-        
-    
+
+    except InvalidPageRequest as e:
+        return jsonify({
+            "error":str(e)
+        }),HTTP_400_BAD_REQUEST
+
     except Exception as e:
         return jsonify({
             "error":str(e)
         }),HTTP_500_INTERNAL_SERVER_ERROR
 
 
+def farmer_details(farmer):
+    return {
+        "id":farmer.farmer_id,
+        "name":farmer.name,
+        "location":farmer.location,
+        "crops_grown":farmer.crops_grown,
+        "created_at":farmer.created_at,
+    }
+
+
 #get farmer by id
 @farmers.get('/farmer/<int:id>')
+@query_budget(1)
 @jwt_required()
 def getfarmer(id):
 
     try:
         farmer = Farmer.query.filter_by(farmer_id=id).first()
 
-      
+        if not farmer:
+            return jsonify({"error": "farmer not found"}), HTTP_404_NOT_FOUND
+
+        details = farmer_details(farmer)
+        etag = make_etag("farmer", current_app.json.dumps(details))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        response = jsonify({
+            "message":"farmer details retrieved successfully",
+            "farmer":details
+        })
+        return with_validators(response, etag)  ,HTTP_200_OK
+    
+    except Exception as e:
+        return jsonify({
+            "error":str(e)
+        }),HTTP_500_INTERNAL_SERVER_ERROR
+
+
+#get several farmers by id, /farmer?ids=1,2,3
+@farmers.get('/farmer')
+@query_budget(1)
+@jwt_required()
+def getfarmers():
+
+    try:
+        ids = get_ids_arg()
+        found = {farmer.farmer_id: farmer_details(farmer) for farmer in Farmer.query.filter(Farmer.farmer_id.in_(ids))}
+        items, missing = in_request_order(ids, found)
 
         return jsonify({
             "message":"farmer details retrieved successfully",
-            "farmer":{
-                "id":farmer.farmer_id,
-                "name":farmer.name,
-                "location":farmer.location,
-                "crops_grown":farmer.crops_grown,
-                "created_at":farmer.created_at,
-               
-            }
+            "farmers":items,
+            "missing":missing
         })  ,HTTP_200_OK
-    
+
+    except InvalidIdsRequest as e:
+        return jsonify({'error': str(e)}), HTTP_400_BAD_REQUEST
+
     except Exception as e:
         return jsonify({
             "error":str(e)
@@ -119,18 +252,16 @@ def getfarmer(id):
 
 #updating the farmer details
 @farmers.route('/edit/<int:id>', methods=["PUT", "PATCH"])
+@query_budget(4)
 @jwt_required()
 def update_farmer_details(id):
     try:
-        current_farmer_id = int(get_jwt_identity())
-        loggedInfarmer = Farmer.query.filter_by(farmer_id=current_farmer_id).first()
-
-        farmer_to_update = Farmer.query.filter_by(farmer_id=id).first()
+        farmer_to_update = db.session.get(Farmer, id)
 
         if not farmer_to_update:
             return jsonify({"error": "farmer not found"}), HTTP_404_NOT_FOUND
 
-        elif farmer_to_update.farmer_id != current_farmer_id:
+        elif farmer_to_update.farmer_id != current_user.id:
             return jsonify({"error": "You are not authorized to update the farmer details"}), HTTP_403_FORBIDDEN
 
         else:
@@ -144,6 +275,7 @@ def update_farmer_details(id):
             farmer_to_update.crops_grown = crops_grown
 
             db.session.commit()
+            farmer_index.update_farmer(farmer_to_update)
 
             farmer_name = farmer_to_update.name
             return jsonify({
@@ -156,7 +288,14 @@ def update_farmer_details(id):
                 }
             })
 
+    except IntegrityError as e:
+        db.session.rollback()
+        if unique_violation(e, "ix_farmers_name", Farmer.name):
+            return jsonify({'error': 'farmer name already exists'}), HTTP_400_BAD_REQUEST
+        return jsonify({'error': str(e)}), HTTP_500_INTERNAL_SERVER_ERROR
+
     except Exception as e:
+        db.session.rollback()
         return jsonify({
             "error": str(e)
         }), HTTP_500_INTERNAL_SERVER_ERROR
@@ -164,11 +303,12 @@ def update_farmer_details(id):
 
 
 @farmers.route('/delete/<int:id>', methods=["DELETE"])
+@query_budget(4)
 @jwt_required()
 def delete_farmer(id):
     try:
         # Retrieve the farmer object from the database
-        farmer = Farmer.query.get(id)
+        farmer = db.session.get(Farmer, id)
         if not farmer:
             return jsonify({'error': 'farmer not found'}), HTTP_404_NOT_FOUND
 
@@ -179,6 +319,7 @@ def delete_farmer(id):
         # Delete the farmer from the database
         db.session.delete(farmer)
         db.session.commit()
+        farmer_index.remove_farmer(id)
 
         # Return a success response
         return jsonify({'message': 'farmer deleted successfully'}), HTTP_200_OK
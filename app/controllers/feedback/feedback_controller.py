@@ -1,14 +1,37 @@
 from flask import Blueprint, request, jsonify
-from app.status_codes import HTTP_400_BAD_REQUEST, HTTP_200_OK, HTTP_404_NOT_FOUND, HTTP_201_CREATED, HTTP_500_INTERNAL_SERVER_ERROR
+from app.status_codes import HTTP_400_BAD_REQUEST, HTTP_200_OK, HTTP_404_NOT_FOUND, HTTP_201_CREATED, HTTP_500_INTERNAL_SERVER_ERROR, HTTP_503_SERVICE_UNAVAILABLE
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.feedback import Feedback
-from app.extensions import db,bcrypt,jwt
+from app.extensions import db
+from app.pagination import InvalidPageRequest
+from app.export import export_response, InvalidExportRequest
+from app.rating_stats import record_rating
+from app.write_buffer import feedback_buffer, FeedbackBufferFull
+from app.query_budget import query_budget
+from app.projection import project_page, InvalidFieldsRequest
+from app.multi_get import get_ids_arg, in_request_order, InvalidIdsRequest
 
 
 # feedback blueprint
 feedback = Blueprint('feedback', __name__, url_prefix='/api/v1/feedbacks')
 
+# output of the feedback list
+FEEDBACK_LIST_FIELDS = [
+    ('feedback_id', Feedback.feedback_id),
+    ('farmer_id', Feedback.farmer_id),
+    ('service_id', Feedback.service_id),
+    ('rating', Feedback.rating),
+    ('comment', Feedback.comment),
+    ('created_at', Feedback.created_at),
+    ('updated_at', Feedback.updated_at),
+]
+
+
+def valid_rating(rating):
+    return isinstance(rating, int) and not isinstance(rating, bool) and 1 <= rating <= 5
+
 @feedback.route('/feedback', methods=["POST"])
+@query_budget(2)
 @jwt_required()
 def create_feedback():
     data = request.get_json()
@@ -20,46 +43,86 @@ def create_feedback():
     if not all([farmer_id, service_id, rating]):
         return jsonify({'error': 'farmer_id, service_id, and rating are required'}), HTTP_400_BAD_REQUEST
 
-    feedback = Feedback(
-        farmer_id=farmer_id,
-        service_id=service_id,
-        rating=rating,
-        comment=comment
-    )
-    db.session.add(feedback)
-    db.session.commit()
+    if not valid_rating(rating):
+        return jsonify({'error': 'rating must be a whole number from 1 to 5'}), HTTP_400_BAD_REQUEST
+
+    if feedback_buffer.enabled:
+        # written together with other requests' feedbacks, returns once committed
+        try:
+            feedback_buffer.submit({
+                'farmer_id': farmer_id,
+                'service_id': service_id,
+                'rating': rating,
+                'comment': comment
+            })
+        except FeedbackBufferFull as e:
+            return jsonify({'error': str(e)}), HTTP_503_SERVICE_UNAVAILABLE
+        except Exception as e:
+            return jsonify({'error': str(e)}), HTTP_500_INTERNAL_SERVER_ERROR
+
+        return jsonify({'message': 'Feedback created successfully'}), HTTP_201_CREATED
+
+    try:
+        feedback = Feedback(
+            farmer_id=farmer_id,
+            service_id=service_id,
+            rating=rating,
+            comment=comment
+        )
+        db.session.add(feedback)
+        record_rating(service_id, new_rating=rating)
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), HTTP_500_INTERNAL_SERVER_ERROR
 
     return jsonify({'message': 'Feedback created successfully'}), HTTP_201_CREATED
 
+# group commit buffer counters
+@feedback.get('/buffer/stats')
+@query_budget(0)
+def feedback_buffer_stats():
+    return jsonify(feedback_buffer.stats()), HTTP_200_OK
+
 # get all feedbacks
 @feedback.route('/')
+@query_budget(1)
 def get_all_feedbacks():
-    feedbacks = Feedback.query.all()
-    output = []
-    for feedback in feedbacks:
-        output.append({
-            'feedback_id': feedback.feedback_id,
-            'farmer_id': feedback.farmer_id,
-            'service_id': feedback.service_id,
-            'rating': feedback.rating,
-            'comment': feedback.comment,
-            'created_at': feedback.created_at,
-            'updated_at': feedback.updated_at
-        })
-    return jsonify(output), HTTP_200_OK
+    try:
+        output, next_cursor = project_page(FEEDBACK_LIST_FIELDS, Feedback.feedback_id)
+    except (InvalidPageRequest, InvalidFieldsRequest) as e:
+        return jsonify({'error': str(e)}), HTTP_400_BAD_REQUEST
+
+    return jsonify({
+        'feedbacks': output,
+        'next_cursor': next_cursor
+    }), HTTP_200_OK
 
     
 
-# get feedback by id
-@feedback.route('/feedbacks/<int:id>', methods=["GET"])
+# export all feedbacks
+@feedback.route('/export', methods=["GET"])
+@query_budget(1)
 @jwt_required()
-def get_feedback(feedback_id):
-    feedback = Feedback.query.get(feedback_id)
-
-    if not feedback:
-        return jsonify({'error': 'Feedback not found'}), HTTP_404_NOT_FOUND
-
-    data = {
+def export_feedbacks():
+    try:
+        return export_response('feedbacks', [
+            ('feedback_id', Feedback.feedback_id),
+            ('farmer_id', Feedback.farmer_id),
+            ('service_id', Feedback.service_id),
+            ('rating', Feedback.rating),
+            ('comment', Feedback.comment),
+            ('created_at', Feedback.created_at),
+            ('updated_at', Feedback.updated_at),
+        ], Feedback.feedback_id)
+
+    except InvalidExportRequest as e:
+        return jsonify({'error': str(e)}), HTTP_400_BAD_REQUEST
+
+
+def feedback_details(feedback):
+    return {
         'feedback_id': feedback.feedback_id,
         'farmer_id': feedback.farmer_id,
         'service_id': feedback.service_id,
@@ -68,33 +131,82 @@ def get_feedback(feedback_id):
         'created_at': feedback.created_at,
         'updated_at': feedback.updated_at
     }
-    return jsonify(data), HTTP_200_OK
-
 
 
-# update a feedback
-@feedback.route('/edit/<int:id>', methods=["PUT"])
+# get feedback by id
+@feedback.route('/feedbacks/<int:feedback_id>', methods=["GET"])
+@query_budget(1)
 @jwt_required()
-def update_feedback(feedback_id):
+def get_feedback(feedback_id):
     feedback = Feedback.query.get(feedback_id)
+
     if not feedback:
         return jsonify({'error': 'Feedback not found'}), HTTP_404_NOT_FOUND
 
-    data = request.get_json()
-    feedback.rating = data.get('rating', feedback.rating)
-    feedback.comment = data.get('comment', feedback.comment)
-    db.session.commit()
+    return jsonify(feedback_details(feedback)), HTTP_200_OK
+
+
+# get several feedbacks by id, /feedbacks?ids=1,2,3
+@feedback.route('/feedbacks', methods=["GET"])
+@query_budget(1)
+@jwt_required()
+def get_feedbacks():
+    try:
+        ids = get_ids_arg()
+    except InvalidIdsRequest as e:
+        return jsonify({'error': str(e)}), HTTP_400_BAD_REQUEST
+
+    found = {feedback.feedback_id: feedback_details(feedback) for feedback in Feedback.query.filter(Feedback.feedback_id.in_(ids))}
+    items, missing = in_request_order(ids, found)
+    return jsonify({'feedbacks': items, 'missing': missing}), HTTP_200_OK
+
+
+
+# update a feedback
+@feedback.route('/edit/<int:feedback_id>', methods=["PUT"])
+@query_budget(3)
+@jwt_required()
+def update_feedback(feedback_id):
+    try:
+        feedback = Feedback.query.get(feedback_id)
+        if not feedback:
+            return jsonify({'error': 'Feedback not found'}), HTTP_404_NOT_FOUND
+
+        data = request.get_json()
+        old_rating = feedback.rating
+        rating = data.get('rating', feedback.rating)
+
+        if rating != old_rating and not valid_rating(rating):
+            return jsonify({'error': 'rating must be a whole number from 1 to 5'}), HTTP_400_BAD_REQUEST
+
+        feedback.rating = rating
+        feedback.comment = data.get('comment', feedback.comment)
+        if rating != old_rating:
+            record_rating(feedback.service_id, old_rating=old_rating, new_rating=rating)
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), HTTP_500_INTERNAL_SERVER_ERROR
 
     return jsonify({'message': 'Feedback updated successfully'}), HTTP_200_OK
 
 # delete feedback
-@feedback.route('/feedbacks/<int:id>', methods=["DELETE"])
+@feedback.route('/feedbacks/<int:feedback_id>', methods=["DELETE"])
+@query_budget(3)
 @jwt_required()
 def delete_feedback(feedback_id):
-    feedback = Feedback.query.get(feedback_id)
-    if not feedback:
-        return jsonify({'error': 'Feedback not found'}), HTTP_404_NOT_FOUND
+    try:
+        feedback = Feedback.query.get(feedback_id)
+        if not feedback:
+            return jsonify({'error': 'Feedback not found'}), HTTP_404_NOT_FOUND
+
+        db.session.delete(feedback)
+        record_rating(feedback.service_id, old_rating=feedback.rating)
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), HTTP_500_INTERNAL_SERVER_ERROR
 
-    db.session.delete(feedback)
-    db.session.commit()
     return jsonify({'message': 'Feedback deleted successfully'}), HTTP_200_OK
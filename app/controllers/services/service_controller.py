@@ -1,8 +1,16 @@
 from flask import Blueprint, request, jsonify
 from app.models.service import Service, db
-from app.extensions import bcrypt, jwt
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.status_codes import HTTP_400_BAD_REQUEST, HTTP_201_CREATED, HTTP_404_NOT_FOUND, HTTP_500_INTERNAL_SERVER_ERROR, HTTP_200_OK,HTTP_403_FORBIDDEN
+from app.pagination import paginate_sorted, InvalidPageRequest
+from app.export import export_response, InvalidExportRequest
+from app.catalog_cache import service_catalog
+from app.models.service_rating_stats import ServiceRatingStats
+from app.query_budget import query_budget
+from app.integrity import unique_violation
+from sqlalchemy.exc import IntegrityError
+from app.conditional import make_etag, not_modified, with_validators
+from app.multi_get import get_ids_arg, in_request_order, InvalidIdsRequest
 
 
 # Create a  service blueprint
@@ -10,6 +18,7 @@ services = Blueprint('service', __name__, url_prefix='/api/v1/services')
 
 # Define and  create service endpoint
 @services.route('/create', methods=["POST"])
+@query_budget(2)
 @jwt_required()
 def create_service():
     try:
@@ -24,11 +33,8 @@ def create_service():
         if not name or not price or not description or not category:
             return jsonify({'error': "All fields are required"}), HTTP_400_BAD_REQUEST
 
-        # Check if service name already exists
-        if Service.query.filter_by(name=name).first() is not None:
-            return jsonify({'error': 'service name already exists'}), HTTP_400_BAD_REQUEST
-
-        # Creating a new service 
+        # Creating a new service, the name is a unique key so a duplicate
+        # fails on the INSERT 
         new_service = Service(
             name=name,
             price=price,
@@ -39,6 +45,7 @@ def create_service():
         # Adding the new service instance to the database session
         db.session.add(new_service)
         db.session.commit()
+        service_catalog.invalidate()
 
         # Return a success response with the newly created service details
         return jsonify({
@@ -53,6 +60,12 @@ def create_service():
             }
         }), HTTP_201_CREATED
 
+    except IntegrityError as e:
+        db.session.rollback()
+        if unique_violation(e, "ix_services_name", Service.name):
+            return jsonify({'error': 'service name already exists'}), HTTP_400_BAD_REQUEST
+        return jsonify({'error': str(e)}), HTTP_500_INTERNAL_SERVER_ERROR
+
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), HTTP_500_INTERNAL_SERVER_ERROR
@@ -61,31 +74,93 @@ def create_service():
 #getting all services
 
 @services.get('/')
+@query_budget(1)
 def get_All_services():
 
     try:
-        all_services = Service.query.all()
-
-        services_data = []
-        for service in all_services:
-            service_info = {
-                "id":service.service_id,
-                "name":service.name,
-                "price":service.price,
-                "description":service.description,              
-                "created_at":service.created_at
-            }
-
-            services_data.append(service_info)
+        # served from the in-memory catalog, already serialized
+        catalog = service_catalog.snapshot()
+        etag = make_etag("services", catalog.digest)
+        cached = not_modified(etag)
+        if cached:
+            return cached
 
+        services_data, next_cursor = paginate_sorted(catalog.encoded, catalog.ids)
 
-        return jsonify({
+        response = jsonify({
                 'message':"All services retrieved successfully",
             "total_services":len(services_data),
-            "services":services_data
-        }),  HTTP_200_OK
+            "services":services_data,
+            "next_cursor":next_cursor
+        })
+        return with_validators(response, etag),  HTTP_200_OK
         
     
+    except InvalidPageRequest as e:
+        return jsonify({
+            "error":str(e)
+        }),HTTP_400_BAD_REQUEST
+
+    except Exception as e:
+        return jsonify({
+            "error":str(e)
+        }),HTTP_500_INTERNAL_SERVER_ERROR
+
+
+#exporting all services
+
+@services.get('/export')
+@query_budget(1)
+@jwt_required()
+def export_services():
+    try:
+        return export_response("services", [
+            ("id", Service.service_id),
+            ("name", Service.name),
+            ("price", Service.price),
+            ("description", Service.description),
+            ("category", Service.category),
+            ("created_at", Service.created_at),
+        ], Service.service_id)
+
+    except InvalidExportRequest as e:
+        return jsonify({
+            "error":str(e)
+        }),HTTP_400_BAD_REQUEST
+
+
+#catalog cache counters
+@services.get('/cache/stats')
+@query_budget(0)
+def service_cache_stats():
+    return jsonify(service_catalog.stats()), HTTP_200_OK
+
+
+#rating summary of a service, a service without ratings is looked up in the catalog (a query when it's cold)
+@services.get('/<int:id>/ratings')
+@query_budget(2)
+def get_service_ratings(id):
+
+    try:
+        stats = db.session.get(ServiceRatingStats, id)
+
+        if stats is None:
+            if id not in service_catalog.snapshot().by_id:
+                return jsonify({"error": "service not found"}), HTTP_404_NOT_FOUND
+            stats = ServiceRatingStats(service_id=id, rating_count=0, rating_sum=0,
+                                       rating_1=0, rating_2=0, rating_3=0, rating_4=0, rating_5=0)
+
+        return jsonify({
+            "message":"service ratings retrieved successfully",
+            "ratings":{
+                "service_id":id,
+                "count":stats.rating_count,
+                "sum":stats.rating_sum,
+                "average":stats.average(),
+                "histogram":stats.histogram()
+            }
+        }),HTTP_200_OK
+
     except Exception as e:
         return jsonify({
             "error":str(e)
@@ -94,26 +169,55 @@ def get_All_services():
 
 #get service by id
 @services.get('/service/<int:id>')
+@query_budget(1)
 @jwt_required()
 def getservice(id):
 
     try:
-        service = Service.query.filter_by(service_id=id).first()
+        catalog = service_catalog.snapshot()
+        service = catalog.encoded_by_id.get(id)
+
+        if not service:
+            return jsonify({"error": "service not found"}), HTTP_404_NOT_FOUND
 
-      
+        # the cached encoding is what the response carries
+        etag = make_etag("service", service.contents)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        response = jsonify({
+            "message":"service details retrieved successfully",
+            "service":service
+        })
+        return with_validators(response, etag)  ,HTTP_200_OK
+    
+    except Exception as e:
+        return jsonify({
+            "error":str(e)
+        }),HTTP_500_INTERNAL_SERVER_ERROR
+
+
+#get several services by id, /service?ids=1,2,3, from the cached catalog
+@services.get('/service')
+@query_budget(1)
+@jwt_required()
+def getservices():
+
+    try:
+        ids = get_ids_arg()
+        catalog = service_catalog.snapshot()
+        items, missing = in_request_order(ids, catalog.encoded_by_id)
 
         return jsonify({
             "message":"service details retrieved successfully",
-            "service":{
-                "id":service.service_id,
-                "name":service.name,
-                "price":service.price,
-                "description":service.description,
-                "created_at":service.created_at,
-               
-            }
+            "services":items,
+            "missing":missing
         })  ,HTTP_200_OK
-    
+
+    except InvalidIdsRequest as e:
+        return jsonify({'error': str(e)}), HTTP_400_BAD_REQUEST
+
     except Exception as e:
         return jsonify({
             "error":str(e)
@@ -122,11 +226,10 @@ def getservice(id):
 
 #updating the service details
 @services.route('/edit/<int:id>', methods=["PUT", "PATCH"])
+@query_budget(3)
 @jwt_required()
 def update_service_details(id):
     try:
-        current_service_id = int(get_jwt_identity())
-        loggedInservice = Service.query.filter_by(service_id=current_service_id).first()
 
         service_to_update = Service.query.filter_by(service_id=id).first()
 
@@ -147,6 +250,7 @@ def update_service_details(id):
             service_to_update.description = description
 
             db.session.commit()
+            service_catalog.invalidate()
 
             service_name = service_to_update.name
             return jsonify({
@@ -159,7 +263,14 @@ def update_service_details(id):
                 }
             })
 
+    except IntegrityError as e:
+        db.session.rollback()
+        if unique_violation(e, "ix_services_name", Service.name):
+            return jsonify({'error': 'service name already exists'}), HTTP_400_BAD_REQUEST
+        return jsonify({'error': str(e)}), HTTP_500_INTERNAL_SERVER_ERROR
+
     except Exception as e:
+        db.session.rollback()
         return jsonify({
             "error": str(e)
         }), HTTP_500_INTERNAL_SERVER_ERROR
@@ -167,11 +278,12 @@ def update_service_details(id):
 
 
 @services.route('/delete/<int:id>', methods=["DELETE"])
+@query_budget(4)
 @jwt_required()
 def delete_service(id):
     try:
         # Retrieve the service object from the database
-        service = Service.query.get(id)
+        service = db.session.get(Service, id)
         if not service:
             return jsonify({'error': 'service not found'}), HTTP_404_NOT_FOUND
 
@@ -182,6 +294,7 @@ def delete_service(id):
         # Delete the service from the database
         db.session.delete(service)
         db.session.commit()
+        service_catalog.invalidate()
 
         # Return a success response
         return jsonify({'message': 'service deleted successfully'}), HTTP_200_OK
@@ -1,54 +1,106 @@
 
+from datetime import datetime
+
 from flask import Blueprint, request, jsonify
 from app.status_codes import HTTP_400_BAD_REQUEST, HTTP_409_CONFLICT, HTTP_500_INTERNAL_SERVER_ERROR, HTTP_201_CREATED, HTTP_401_UNAUTHORIZED, HTTP_200_OK,HTTP_404_NOT_FOUND,HTTP_403_FORBIDDEN
-import validators
 from app.models.user import User
 from flask_jwt_extended import create_access_token, create_refresh_token
-from flask_jwt_extended import get_jwt_identity, jwt_required
-from app.extensions import db, bcrypt
-from sqlalchemy import or_
+from flask_jwt_extended import jwt_required, current_user
+from app.extensions import db
+from app.passwords import password_hasher
+from app.pagination import get_page_args, encode_cursor, InvalidPageRequest
+from app.user_search import user_search_index
+from app.export import export_response, InvalidExportRequest
+from app.query_budget import query_budget
+from app.projection import project_page, InvalidFieldsRequest
+from app.auth_cache import identity_cache
+from app.multi_get import get_ids_arg, in_request_order, InvalidIdsRequest
+from app.integrity import unique_violation
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
 
 # users blueprint
 users = Blueprint('users', __name__, url_prefix='/api/v1/users')
 
 
+# output of the user list, only these columns are read (never the password)
+USER_LIST_FIELDS = [
+    ("id", User.user_id),
+    ("first_name", User.first_name),
+    ("last_name", User.last_name),
+    ("username", (User.first_name + " " + User.last_name).label("username")),
+    ("email", User.email),
+    ("contact", User.contact),
+    ("type", User.user_type),
+    ("created_at", User.created_at),
+]
+
+
 #Retrieving data from database
 
 @users.get('/')
+@query_budget(1)
 def getAllusers():
 
     try:
-        all_users = User.query.all()
-
-        users_data = []
-        for user in all_users:
-            user_info = {
-                "id":user.user_id,
-                "first_name":user.first_name,
-                "last_name":user.last_name,
-                "username":user.get_full_name(),
-                "email":user.email,
-                "contact":user.contact,
-                "type":user.user_type,
-                "created_at":user.created_at,
-            }
-
-            users_data.append(user_info)
-
+        users_data, next_cursor = project_page(USER_LIST_FIELDS, User.user_id)
 
         return jsonify({
             'message':"All users retrieved successfully",
-            "users":users_data
+            "users":users_data,
+            "next_cursor":next_cursor
         }),HTTP_200_OK
     
+    except (InvalidPageRequest, InvalidFieldsRequest) as e:
+        return jsonify({
+            "error":str(e)
+        }),HTTP_400_BAD_REQUEST
+
     except Exception as e:
         return jsonify({
             "error":str(e)
         }),HTTP_500_INTERNAL_SERVER_ERROR
 
 
+#exporting all users
+
+@users.get('/export')
+@query_budget(1)
+@jwt_required()
+def export_users():
+    try:
+        return export_response("users", [
+            ("id", User.user_id),
+            ("first_name", User.first_name),
+            ("last_name", User.last_name),
+            ("email", User.email),
+            ("contact", User.contact),
+            ("type", User.user_type),
+            ("created_at", User.created_at),
+        ], User.user_id)
+
+    except InvalidExportRequest as e:
+        return jsonify({
+            "error":str(e)
+        }),HTTP_400_BAD_REQUEST
+
+
+def user_details(user):
+    return {
+        "id":user.user_id,
+        "first_name":user.first_name,
+        "last_name":user.last_name,
+        "username":user.get_full_name(),
+        "email":user.email,
+        "contact":user.contact,
+        "type":user.user_type,
+        "created_at":user.created_at,
+    }
+
+
 #get user by id
 @users.get('/user/<int:id>')
+@query_budget(1)
 @jwt_required()
 def getuser(id):
 
@@ -59,17 +111,7 @@ def getuser(id):
 
         return jsonify({
             "message":"user details retrieved successfully",
-            "user":{
-                "id":user.user_id,
-                "first_name":user.first_name,
-                "last_name":user.last_name,
-                "username":user.get_full_name(),
-                "email":user.email,
-                "contact":user.contact,
-                "type":user.user_type,
-                "created_at":user.created_at,
-               
-            }
+            "user":user_details(user)
         })  ,HTTP_200_OK
     
     except Exception as e:
@@ -78,44 +120,68 @@ def getuser(id):
         }),HTTP_500_INTERNAL_SERVER_ERROR
 
 
+#get several users by id, /user?ids=1,2,3
+@users.get('/user')
+@query_budget(1)
+@jwt_required()
+def getusers():
+
+    try:
+        ids = get_ids_arg()
+        found = {user.user_id: user_details(user) for user in User.query.filter(User.user_id.in_(ids))}
+        items, missing = in_request_order(ids, found)
+
+        return jsonify({
+            "message":"user details retrieved successfully",
+            "users":items,
+            "missing":missing
+        })  ,HTTP_200_OK
+
+    except InvalidIdsRequest as e:
+        return jsonify({"error":str(e)}),HTTP_400_BAD_REQUEST
+
+    except Exception as e:
+        return jsonify({
+            "error":str(e)
+        }),HTTP_500_INTERNAL_SERVER_ERROR
+
+
 
 #update the user details
 @users.route('/edit/<int:id>', methods=["PUT","PATCH"])
+@query_budget(2)
 @jwt_required()
 def updateuserdetails(id):
     try:
-        current_user = int(get_jwt_identity())
-        loggedInUser = User.query.filter_by(user_id=current_user).first()
+        # users only edit themselves, current_user.id needs no query
+        if id != current_user.id:
+            return jsonify({"error":"You are not authorised to update the user details"}),HTTP_403_FORBIDDEN
 
-        user = User.query.filter_by(user_id=id).first()
+        # only the sent fields are written, one UPDATE and no SELECT before it
+        data = request.get_json()
+        changes = {field: data[field] for field in ('first_name', 'last_name', 'email', 'contact', 'user_type') if field in data}
+
+        if changes or "password" in data:
+            changes['updated_at'] = datetime.now()
+            if "password" in data:
+                changes['password'] = password_hasher.generate_password_hash(data.get('password'))
+
+            db.session.execute(update(User).where(User.user_id == id).values(**changes))
+            db.session.commit()
+            identity_cache.invalidate(id)
+
+        # the response and the search index get the committed row, the cached
+        # profile may be older than a write made by another worker
+        user = identity_cache.get(id, fresh=True)
 
         if not user:
             return jsonify({"error":"user not found"}), HTTP_404_NOT_FOUND
 
-        elif user.user_id!=current_user:
-            return jsonify({"error":"You are not authorised to update the user details"}),HTTP_403_FORBIDDEN
-        
         else:
-            first_name = request.get_json().get('first_name',user.first_name)
-            last_name = request.get_json().get('last_name',user.last_name)
-            email = request.get_json().get('email',user.email)
-            contact = request.get_json().get('contact',user.contact)
-            password = request.get_json().get('first_name',user.first_name)
-            user_type = request.get_json().get('user_type',user.user_type)
-
-            if "password" in request.json:
-                hashed_password = bcrypt.generate_password_hash(request.json.get('password'))
-                user.password = hashed_password
-
-            user.first_name = first_name
-            user.last_name = last_name
-            user.email = email
-            user.contact = contact
-            user.user_type = user_type
-            
-            db.session.commit()
+            if changes:
+                user_search_index.update_user(user)
 
-            user_name = user.get_full_name()
+            user_name = f"{user.first_name} {user.last_name}"
             return jsonify({
                  "message":user_name + "'s details have been successfully updated",
                  "user":{
@@ -129,6 +195,14 @@ def updateuserdetails(id):
                      
                  }
              })
+
+    except IntegrityError as e:
+        db.session.rollback()
+        if unique_violation(e, "email", User.email):
+            return jsonify({"error":"Email address in use"}),HTTP_409_CONFLICT
+        if unique_violation(e, "ix_users_contact", User.contact):
+            return jsonify({"error":"Number is already in use"}),HTTP_409_CONFLICT
+        return jsonify({"error":str(e)}),HTTP_500_INTERNAL_SERVER_ERROR
         
     except Exception as e:
         return jsonify({
@@ -138,20 +212,18 @@ def updateuserdetails(id):
 
 #delete the USER
 @users.route('/delete/<int:id>', methods=["DELETE"])
+@query_budget(4)
 @jwt_required()
 def Delete_user_details(id):
      
      try:
-        current_user_id = int(get_jwt_identity())
-        loggedInUser = User.query.filter_by(user_id=current_user_id).first()
+        if id != current_user.id:
+            return jsonify({"error":"You are not authorised to delete the author details"}),HTTP_403_FORBIDDEN
 
-        user = User.query.filter_by(user_id=id).first()
+        user = db.session.get(User, id)
 
         if not user:
             return jsonify({"error":"user not found"}), HTTP_404_NOT_FOUND
-
-        elif user.user_id!= current_user_id:
-            return jsonify({"error":"You are not authorised to delete the author details"}),HTTP_403_FORBIDDEN
         
         else:
 
@@ -165,6 +237,8 @@ def Delete_user_details(id):
     
             db.session.delete(user)
             db.session.commit()
+            identity_cache.invalidate(id)
+            user_search_index.remove_user(id)
 
             
             return jsonify({
@@ -181,22 +255,26 @@ def Delete_user_details(id):
 #searching a user
 
 @users.get('/search')
+@query_budget(2)
 @jwt_required()
 def search_users():
 
     try:
 
         search_query = request.args.get('query','')
+        limit, offset = get_page_args()
+        offset = offset or 0
 
-        users =User.query.filter(
-    
-      or_( User.first_name.ilike(f"%{search_query}%"),
-       User.last_name.ilike(f"%{search_query}%")
-      ),
-   User.user_type == 'user'
-).all()
+        # ranked matches come from the trigram index, only the page is loaded
+        user_ids, total = user_search_index.search(search_query, user_type='user', offset=offset, limit=limit)
+        found = {user.user_id: user for user in User.query.filter(User.user_id.in_(user_ids)).all()}
+        users = [found[user_id] for user_id in user_ids if user_id in found]
+
+        next_cursor = None
+        if offset + limit < total:
+            next_cursor = encode_cursor(offset + limit)
         
-        if len(users) == 0:
+        if total == 0:
             return jsonify({
                 "message" : "no results found"
             }),HTTP_404_NOT_FOUND
@@ -222,10 +300,16 @@ def search_users():
 
         return jsonify({
             'message':f"users with name {search_query} retrieved successfully",
-            "total_search":len(users_data),
-            "search_results":users_data
+            "total_search":total,
+            "search_results":users_data,
+            "next_cursor":next_cursor
         }),HTTP_200_OK
     
+    except InvalidPageRequest as e:
+        return jsonify({
+            "error":str(e)
+        }),HTTP_400_BAD_REQUEST
+
     except Exception as e:
         return jsonify({
             "error":str(e)
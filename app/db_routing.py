@@ -0,0 +1,152 @@
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.expression import UpdateBase
+
+
+# Read/write splitting between the primary database and read replicas.
+#
+# SQLALCHEMY_DATABASE_URI stays the primary. Every uri in
+# SQLALCHEMY_REPLICA_URIS becomes a "replica_<n>" bind. GET/HEAD requests pick
+# one healthy replica (round robin) and all their reads go there; everything
+# else, flushes and INSERT/UPDATE/DELETE statements always use the primary.
+# A replica that fails with a connection error is ejected for a while.
+#
+# Read-your-writes: once a session has written it stays on the primary, and a
+# client that just made a successful write gets a short lived cookie that
+# sends its next reads to the primary too.
+
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+STICKY_COOKIE = "db_primary_until"
+
+
+class ReplicaRouter:
+
+    def __init__(self):
+        self.keys = []
+        self.eject_seconds = 30
+        self.sticky_seconds = 5
+        self._ejected = {}
+        self._engine_keys = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        # must run before db.init_app so the replica binds get engines
+        uris = app.config.get("SQLALCHEMY_REPLICA_URIS") or []
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+
+        self.keys = []
+        for number, uri in enumerate(uris):
+            key = f"replica_{number}"
+            binds[key] = uri
+            self.keys.append(key)
+
+        app.config["SQLALCHEMY_BINDS"] = binds
+        self.eject_seconds = app.config.get("REPLICA_EJECT_SECONDS", self.eject_seconds)
+        self.sticky_seconds = app.config.get("READ_YOUR_WRITES_SECONDS", self.sticky_seconds)
+
+        if self.keys:
+            app.before_request(self._choose_route)
+            app.after_request(self._remember_write)
+
+    # health
+
+    def healthy_keys(self):
+        now = time.monotonic()
+        return [key for key in self.keys if self._ejected.get(key, 0) <= now]
+
+    def eject(self, key):
+        with self._lock:
+            self._ejected[key] = time.monotonic() + self.eject_seconds
+
+    def pick(self):
+        healthy = self.healthy_keys()
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    def _watch(self, key, engine):
+        if id(engine) in self._engine_keys:
+            return
+        self._engine_keys[id(engine)] = key
+
+        @event.listens_for(engine, "handle_error")
+        def eject_on_disconnect(context):
+            if context.is_disconnect or context.connection is None:
+                self.eject(key)
+
+    # routing
+
+    def _is_sticky(self):
+        try:
+            return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def _choose_route(self):
+        if request.method in READ_METHODS and not self._is_sticky():
+            g.replica_key = self.pick()
+
+    def _remember_write(self, response):
+        if request.method not in READ_METHODS and response.status_code < 400:
+            response.set_cookie(
+                STICKY_COOKIE,
+                str(time.time() + self.sticky_seconds),
+                max_age=self.sticky_seconds,
+                httponly=True,
+            )
+        return response
+
+    def engine_for(self, db):
+        if not has_request_context() or g.get("use_primary"):
+            return None
+        key = g.get("replica_key")
+        if key is None:
+            return None
+        engine = db.engines[key]
+        self._watch(key, engine)
+        return engine
+
+
+replica_router = ReplicaRouter()
+
+
+@contextmanager
+def use_primary():
+    # forces the reads in this block to the primary, e.g. to fill a cache
+    # that must not be loaded from a lagging replica
+    if not has_request_context():
+        yield
+        return
+
+    previous = g.get("use_primary")
+    g.use_primary = True
+    try:
+        yield
+    finally:
+        g.use_primary = previous
+
+
+class RoutingSession(Session):
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if isinstance(clause, UpdateBase):
+            self.info["wrote"] = True
+
+        if bind is None and not self._flushing and not self.info.get("wrote"):
+            engine = replica_router.engine_for(self._db)
+            if engine is not None:
+                return engine
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _stay_on_primary(session, flush_context):
+    session.info["wrote"] = True
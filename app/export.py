@@ -0,0 +1,79 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from flask import Response, request, stream_with_context, current_app
+from sqlalchemy import select
+
+from app.extensions import db
+
+
+# Shared streaming export used by the /export endpoints of every blueprint.
+# Rows are read through a server side cursor (yield_per) and written out as
+# they arrive, so memory stays flat no matter how big the table is.
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+class InvalidExportRequest(ValueError):
+    pass
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _rows(columns, key_column, batch_size):
+    stmt = select(*[column for _, column in columns]).order_by(key_column)
+    # full_scan: the whole table on purpose, check-query-plans skips it
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size, full_scan=True))
+    for partition in result.partitions():
+        yield partition
+
+
+def _ndjson(columns, key_column, batch_size):
+    names = [name for name, _ in columns]
+    for partition in _rows(columns, key_column, batch_size):
+        yield "".join(
+            json.dumps(dict(zip(names, map(_value, row))), separators=(",", ":")) + "\n"
+            for row in partition
+        )
+
+
+def _csv(columns, key_column, batch_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow([name for name, _ in columns])
+    yield buffer.getvalue()
+
+    for partition in _rows(columns, key_column, batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_value(value) for value in row] for row in partition)
+        yield buffer.getvalue()
+
+
+def export_response(filename, columns, key_column):
+    # columns is a list of (output name, model column) pairs
+    export_format = request.args.get("format", "ndjson").lower()
+    if export_format not in EXPORT_FORMATS:
+        raise InvalidExportRequest("format must be one of: " + ", ".join(EXPORT_FORMATS))
+
+    batch_size = current_app.config.get("EXPORT_BATCH_SIZE", 1000)
+    if export_format == "csv":
+        body = _csv(columns, key_column, batch_size)
+    else:
+        body = _ndjson(columns, key_column, batch_size)
+
+    return Response(
+        stream_with_context(body),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f"attachment; filename={filename}.{export_format}"},
+    )
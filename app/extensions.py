@@ -1,14 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 
 
-from flask_jwt_extended import JWTManager
-from flask_bcrypt import Bcrypt
+from app.db_routing import RoutingSession
+from app.auth_cache import CachingJWTManager
 
 
-db = SQLAlchemy()
-migrate = Migrate()
-
-jwt = JWTManager()
-bcrypt =  Bcrypt()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
+jwt = CachingJWTManager()  # remembers verified tokens until they expire
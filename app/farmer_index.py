@@ -0,0 +1,127 @@
+import re
+import threading
+import time
+from collections import Counter
+
+from app.extensions import db
+
+
+# In-memory crop/location index for /api/v1/farmers/search.
+# crops_grown is free text ("Coffee, beans and maize"), so it is split into
+# normalized crop names and every crop and location keeps a posting set of
+# farmer ids. "Which farmers in Mbarara grow coffee" becomes a set intersection
+# instead of string matching every farmer row.
+
+_CROP_SEPARATORS = re.compile(r"\s*(?:,|;|/|\band\b|&)\s*", re.IGNORECASE)
+
+
+def normalize(text):
+    return " ".join((text or "").lower().split())
+
+
+def split_crops(crops_grown):
+    return {normalize(crop) for crop in _CROP_SEPARATORS.split(crops_grown or "") if normalize(crop)}
+
+
+class FarmerIndex:
+
+    def __init__(self):
+        self.refresh_interval = None
+        self.built_at = None
+        self._farmers = {}
+        self._by_crop = {}
+        self._by_location = {}
+        self._lock = threading.RLock()
+
+    def init_app(self, app):
+        self.refresh_interval = app.config.get("FARMER_INDEX_REFRESH_SECONDS")
+
+    def _add(self, farmer_id, location, crops_grown):
+        crops = split_crops(crops_grown)
+        location = normalize(location)
+        self._farmers[farmer_id] = (location, crops)
+        self._by_location.setdefault(location, set()).add(farmer_id)
+        for crop in crops:
+            self._by_crop.setdefault(crop, set()).add(farmer_id)
+
+    def _remove(self, farmer_id):
+        entry = self._farmers.pop(farmer_id, None)
+        if entry is None:
+            return
+        location, crops = entry
+        for postings, key in [(self._by_location, location)] + [(self._by_crop, crop) for crop in crops]:
+            ids = postings.get(key)
+            if ids is not None:
+                ids.discard(farmer_id)
+                if not ids:
+                    del postings[key]
+
+    def add_farmer(self, farmer):
+        with self._lock:
+            if self.built_at is not None:
+                self._remove(farmer.farmer_id)
+                self._add(farmer.farmer_id, farmer.location, farmer.crops_grown)
+
+    update_farmer = add_farmer
+
+    def remove_farmer(self, farmer_id):
+        with self._lock:
+            if self.built_at is not None:
+                self._remove(farmer_id)
+
+    def build(self, batch_size=10000):
+        from app.models.farmer import Farmer
+
+        with self._lock:
+            self._farmers = {}
+            self._by_crop = {}
+            self._by_location = {}
+            stmt = db.select(Farmer.farmer_id, Farmer.location, Farmer.crops_grown)
+            # full_scan: the whole table on purpose, check-query-plans skips it
+            for row in db.session.execute(stmt.execution_options(yield_per=batch_size, full_scan=True)):
+                self._add(*row)
+            self.built_at = time.monotonic()
+
+    def _stale(self):
+        return self.built_at is None or (
+            self.refresh_interval is not None
+            and time.monotonic() - self.built_at > self.refresh_interval
+        )
+
+    def ensure_built(self):
+        # the lock is held while loading, writes and searches made meanwhile
+        # wait for it; checked again under the lock so the threads that
+        # waited use the index just built instead of loading it once each
+        if self._stale():
+            with self._lock:
+                if self._stale():
+                    self.build()
+
+    def search(self, crop=None, location=None):
+        # returns (sorted matching farmer ids, crop facet counts, location facet counts)
+        self.ensure_built()
+
+        with self._lock:
+            posting_sets = []
+            if crop:
+                posting_sets.append(self._by_crop.get(normalize(crop), set()))
+            if location:
+                posting_sets.append(self._by_location.get(normalize(location), set()))
+
+            if posting_sets:
+                posting_sets.sort(key=len)
+                farmer_ids = posting_sets[0].intersection(*posting_sets[1:])
+            else:
+                farmer_ids = self._farmers.keys()
+
+            crop_counts = Counter()
+            location_counts = Counter()
+            for farmer_id in farmer_ids:
+                location_name, crops = self._farmers[farmer_id]
+                location_counts[location_name] += 1
+                crop_counts.update(crops)
+
+            return sorted(farmer_ids), dict(crop_counts), dict(location_counts)
+
+
+farmer_index = FarmerIndex()
@@ -0,0 +1,29 @@
+import re
+
+
+# Maps an IntegrityError back to the unique rule it broke, so the create
+# endpoints can insert straight away and let the database refuse duplicates
+# (no SELECT first, and no race between the check and the insert).
+#
+# MySQL names the key: Duplicate entry 'x' for key 'users.ix_users_contact'
+# (without the "users." before 8.0), sqlite names the columns:
+# UNIQUE constraint failed: users.contact
+
+MYSQL_KEY = re.compile(r"for key '(?:[^'.]+\.)?([^']+)'")
+SQLITE_COLUMNS = re.compile(r"UNIQUE constraint failed: ([\w., ]+)")
+
+
+def unique_violation(error, key, *columns):
+    # True if the IntegrityError was raised by the unique key `key` on `columns`
+    message = str(getattr(error, "orig", error))
+
+    match = MYSQL_KEY.search(message)
+    if match:
+        return match.group(1) == key
+
+    match = SQLITE_COLUMNS.search(message)
+    if match:
+        failed = {name.strip() for name in match.group(1).split(",")}
+        return failed == {f"{column.table.name}.{column.name}" for column in columns}
+
+    return False
@@ -0,0 +1,139 @@
+import dataclasses
+import decimal
+import json
+import uuid
+from collections.abc import Mapping
+from datetime import date, datetime
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib encoder is used without it
+    orjson = None
+
+
+# JSON provider used by jsonify() in every blueprint.
+#
+# Encodes with orjson when it is installed and with the stdlib json module
+# otherwise. Dates and datetimes are written as ISO-8601. A Fragment holds
+# JSON that is already encoded (e.g. a cached payload); it is spliced into
+# the output as is instead of being encoded again. orjson 3.9+ does that
+# itself (orjson.Fragment); with older orjson or the stdlib encoder the dicts
+# and lists that hold fragments are written out here piece by piece.
+
+ORJSON_FRAGMENT = getattr(orjson, "Fragment", None)
+
+
+class Fragment:
+    __slots__ = ("contents",)
+
+    def __init__(self, contents):
+        self.contents = contents.encode() if isinstance(contents, str) else contents
+
+
+def _contains_fragment(obj):
+    if isinstance(obj, Fragment):
+        return True
+    if isinstance(obj, dict):
+        return any(_contains_fragment(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(_contains_fragment(value) for value in obj)
+    return False
+
+
+def _default(o):
+    # types neither encoder handles on its own
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if isinstance(o, Mapping):
+        return dict(o)
+    if isinstance(o, (tuple, set, frozenset)):
+        return list(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(JSONProvider):
+
+    # jsonify output is for machines, sorting keys only costs time
+    sort_keys = False
+    mimetype = "application/json"
+
+    def _encode(self, obj, default):
+        if orjson is not None:
+            option = orjson.OPT_NON_STR_KEYS
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            return orjson.dumps(obj, default=default, option=option)
+        return json.dumps(obj, default=default, ensure_ascii=False, sort_keys=self.sort_keys,
+                          separators=(",", ":")).encode()
+
+    def dumps_bytes(self, obj):
+        if ORJSON_FRAGMENT is not None:
+            def default(o):
+                if isinstance(o, Fragment):
+                    return ORJSON_FRAGMENT(o.contents)
+                return _default(o)
+
+            return self._encode(obj, default)
+
+        found = []
+
+        def default(o):
+            if isinstance(o, Fragment):
+                found.append(o)
+                raise TypeError("fragment")
+            return _default(o)
+
+        # most responses hold no fragment and are encoded in one call
+        try:
+            return self._encode(obj, default)
+        except TypeError:
+            if not found:
+                raise
+        return self._assemble(obj)
+
+    def _assemble(self, obj):
+        # writes the containers that hold fragments, everything without one
+        # goes to the encoder whole
+        if isinstance(obj, Fragment):
+            return obj.contents
+
+        def default(o):
+            # a fragment inside something only _default knows how to convert
+            if isinstance(o, Fragment):
+                return json.loads(o.contents)
+            return _default(o)
+
+        if not _contains_fragment(obj):
+            return self._encode(obj, default)
+
+        if isinstance(obj, dict):
+            items = sorted(obj.items()) if self.sort_keys else obj.items()
+            return b"{" + b",".join(
+                self._encode(key if isinstance(key, str) else str(key), default) + b":" + self._assemble(value)
+                for key, value in items
+            ) + b"}"
+        return b"[" + b",".join(self._assemble(value) for value in obj) + b"]"
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # callers asking for indent etc. get the stdlib encoder
+            kwargs.setdefault("default", _default)
+            return json.dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
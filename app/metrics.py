@@ -0,0 +1,207 @@
+import threading
+import time
+
+from flask import Response, g, request, has_request_context
+from sqlalchemy import event
+
+from app.query_budget import query_budget
+
+
+# Per-request latency and SQL metrics in Prometheus text format at /metrics.
+#
+# before/after_request time every request, the cursor execute events count
+# the statements and SQL time of the request it runs in, and the pool
+# connect call is timed to get the checkout wait. Everything is kept in
+# plain dicts under one lock, so the cost per request is a few dict updates.
+# Each worker process keeps its own numbers.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CHECKOUT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.total += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels}le="+Inf"}} {self.total}'
+        yield f'{name}_sum{{{labels.rstrip(",")}}} {self.sum}'
+        yield f'{name}_count{{{labels.rstrip(",")}}} {self.total}'
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+class Metrics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._requests = {}
+        self._sql_statements = {}
+        self._sql_seconds = {}
+        self._checkout_wait = {}
+        self._engines = {}
+
+    def init_app(self, app, db):
+        if not app.config.get("METRICS_ENABLED", True):
+            return
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule("/metrics", "metrics", self.export)
+
+        with app.app_context():
+            for key, engine in db.engines.items():
+                self._instrument_engine(key or "primary", engine)
+
+    # instrumentation
+
+    def _instrument_engine(self, name, engine):
+        self._engines[name] = engine
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info["metrics_started"].pop()
+            if has_request_context() and "metrics_started" in g:
+                g.metrics_sql_statements += 1
+                g.metrics_sql_seconds += time.perf_counter() - started
+
+        @event.listens_for(engine, "engine_disposed")
+        def engine_disposed(engine):
+            # dispose() swaps in a new pool, time that one too
+            self._time_checkouts(name, engine.pool)
+
+        self._time_checkouts(name, engine.pool)
+
+    def _time_checkouts(self, name, pool):
+        connect = pool.connect
+
+        def timed_connect():
+            started = time.perf_counter()
+            try:
+                return connect()
+            finally:
+                waited = time.perf_counter() - started
+                with self._lock:
+                    histogram = self._checkout_wait.get(name)
+                    if histogram is None:
+                        histogram = self._checkout_wait[name] = Histogram(CHECKOUT_BUCKETS)
+                    histogram.observe(waited)
+
+        pool.connect = timed_connect
+
+    def _start_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_sql_statements = 0
+        g.metrics_sql_seconds = 0.0
+
+    def _finish_request(self, response):
+        if "metrics_started" not in g:
+            return response
+
+        elapsed = time.perf_counter() - g.metrics_started
+        endpoint = request.endpoint or "unmatched"
+        method = request.method
+
+        with self._lock:
+            key = (endpoint, method)
+            histogram = self._latency.get(key)
+            if histogram is None:
+                histogram = self._latency[key] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(elapsed)
+
+            status_key = (endpoint, method, response.status_code)
+            self._requests[status_key] = self._requests.get(status_key, 0) + 1
+            self._sql_statements[key] = self._sql_statements.get(key, 0) + g.metrics_sql_statements
+            self._sql_seconds[key] = self._sql_seconds.get(key, 0.0) + g.metrics_sql_seconds
+
+        return response
+
+    # export
+
+    def _pool_gauges(self):
+        # only QueuePool has these, e.g. a sqlite memory database has none
+        for metric, method in (("size", "size"), ("overflow", "overflow"), ("checked_out", "checkedout")):
+            values = [
+                (name, getattr(engine.pool, method)())
+                for name, engine in sorted(self._engines.items())
+                if hasattr(engine.pool, method)
+            ]
+            if values:
+                yield metric, values
+
+    def render(self):
+        lines = []
+        with self._lock:
+            lines.append("# HELP http_request_duration_seconds Request latency by endpoint.")
+            lines.append("# TYPE http_request_duration_seconds histogram")
+            for (endpoint, method), histogram in sorted(self._latency.items()):
+                labels = f'endpoint="{_label(endpoint)}",method="{method}",'
+                lines.extend(histogram.lines("http_request_duration_seconds", labels))
+
+            lines.append("# HELP http_requests_total Requests by endpoint and status.")
+            lines.append("# TYPE http_requests_total counter")
+            for (endpoint, method, status), count in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{{endpoint="{_label(endpoint)}",method="{method}",status="{status}"}} {count}')
+
+            lines.append("# HELP sql_statements_total SQL statements executed by endpoint.")
+            lines.append("# TYPE sql_statements_total counter")
+            for (endpoint, method), count in sorted(self._sql_statements.items()):
+                lines.append(f'sql_statements_total{{endpoint="{_label(endpoint)}",method="{method}"}} {count}')
+
+            lines.append("# HELP sql_duration_seconds_total Time spent in SQL by endpoint.")
+            lines.append("# TYPE sql_duration_seconds_total counter")
+            for (endpoint, method), seconds in sorted(self._sql_seconds.items()):
+                lines.append(f'sql_duration_seconds_total{{endpoint="{_label(endpoint)}",method="{method}"}} {seconds}')
+
+            lines.append("# HELP db_pool_checkout_wait_seconds Time spent waiting for a pooled connection.")
+            lines.append("# TYPE db_pool_checkout_wait_seconds histogram")
+            for name, histogram in sorted(self._checkout_wait.items()):
+                lines.extend(histogram.lines("db_pool_checkout_wait_seconds", f'bind="{_label(name)}",'))
+
+        for metric, values in self._pool_gauges():
+            lines.append(f"# TYPE db_pool_{metric} gauge")
+            for name, value in values:
+                lines.append(f'db_pool_{metric}{{bind="{_label(name)}"}} {value}')
+
+        from app.catalog_cache import service_catalog
+        stats = service_catalog.stats()
+        lines.append("# TYPE service_catalog_cache_hits_total counter")
+        lines.append(f"service_catalog_cache_hits_total {stats['hits']}")
+        lines.append("# TYPE service_catalog_cache_misses_total counter")
+        lines.append(f"service_catalog_cache_misses_total {stats['misses']}")
+
+        from app.write_buffer import feedback_buffer
+        if feedback_buffer.enabled:
+            lines.extend(feedback_buffer.metric_lines())
+
+        return "\n".join(lines) + "\n"
+
+    @query_budget(0)
+    def export(self):
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+
+metrics = Metrics()
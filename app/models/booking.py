@@ -3,12 +3,15 @@ from datetime import datetime
 
 class Booking(db.Model):
     __tablename__ = "bookings"
+    __table_args__ = (
+        db.Index('ix_bookings_user_id_status', 'user_id', 'status', unique=True),
+    )
     booking_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'))  
-    service_id = db.Column(db.Integer, db.ForeignKey('services.service_id'))  
+    service_id = db.Column(db.Integer, db.ForeignKey('services.service_id'), index=True)  
     status = db.Column(db.String(50))
-    created_at = db.Column(db.DateTime, default=datetime.now())  
-    updated_at = db.Column(db.DateTime, onupdate=datetime.now())  
+    created_at = db.Column(db.DateTime, default=datetime.now)  
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)  
 
 
     user = db.relationship('User', backref='bookings')
@@ -5,7 +5,7 @@ class Farmer(db.Model):
     __tablename__ = "farmers"  
     farmer_id = db.Column(db.Integer, primary_key=True)
     location = db.Column(db.String(100))
-    name = db.Column(db.String(50))
+    name = db.Column(db.String(50), index=True, unique=True)
     crops_grown = db.Column(db.String(200))
-    created_at = db.Column(db.DateTime,default = datetime.now())
-    updated_at = db.Column(db.DateTime, onupdate = datetime.now())
\ No newline at end of file
+    created_at = db.Column(db.DateTime,default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, index=True)
\ No newline at end of file
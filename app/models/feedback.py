@@ -4,12 +4,12 @@ from datetime import datetime
 class Feedback(db.Model):
     __tablename__= "feedbacks"
     feedback_id = db.Column(db.Integer, primary_key=True)
-    farmer_id = db.Column(db.Integer, db.ForeignKey('farmers.farmer_id'))
-    service_id = db.Column(db.Integer, db.ForeignKey('services.service_id'))
+    farmer_id = db.Column(db.Integer, db.ForeignKey('farmers.farmer_id'), index=True)
+    service_id = db.Column(db.Integer, db.ForeignKey('services.service_id'), index=True)
     rating = db.Column(db.Integer)
     comment = db.Column(db.String(255))
-    created_at = db.Column(db.DateTime,default = datetime.now())
-    updated_at = db.Column(db.DateTime, onupdate = datetime.now())
+    created_at = db.Column(db.DateTime,default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
 
     farmer = db.relationship('Farmer', backref='feedbacks')
     service = db.relationship('Service', backref='feedbacks')
\ No newline at end of file
@@ -0,0 +1,12 @@
+from app.extensions import db
+from datetime import datetime
+
+class RevokedToken(db.Model):
+    __tablename__= "revoked_tokens"
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    token_type = db.Column(db.String(10), nullable=False)
+    user_id = db.Column(db.Integer)
+    # rows are pruned once the token would have expired anyway
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.now, nullable=False, index=True)
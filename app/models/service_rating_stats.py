@@ -0,0 +1,22 @@
+from app.extensions import db
+from datetime import datetime
+
+class ServiceRatingStats(db.Model):
+    __tablename__= "service_rating_stats"
+    service_id = db.Column(db.Integer, db.ForeignKey('services.service_id'), primary_key=True)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_1 = db.Column(db.Integer, nullable=False, default=0)
+    rating_2 = db.Column(db.Integer, nullable=False, default=0)
+    rating_3 = db.Column(db.Integer, nullable=False, default=0)
+    rating_4 = db.Column(db.Integer, nullable=False, default=0)
+    rating_5 = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def average(self):
+        if not self.rating_count:
+            return None
+        return round(self.rating_sum / self.rating_count, 2)
+
+    def histogram(self):
+        return {str(rating): getattr(self, f"rating_{rating}") for rating in range(1, 6)}
@@ -0,0 +1,8 @@
+from app.extensions import db
+
+class TableVersion(db.Model):
+    __tablename__= "table_versions"
+    # one row per table whose list responses carry an ETag, bumped by every
+    # write to that table (see app/conditional.py)
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
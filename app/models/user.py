@@ -8,11 +8,11 @@ class User(db.Model):
     first_name = db.Column(db.String(100), nullable=False)
     last_name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    contact = db.Column(db.String(20))
+    contact = db.Column(db.String(20), index=True, unique=True)
     password = db.Column(db.String(128), nullable=False)
     user_type = db.Column(db.String(50), nullable=False) 
-    created_at = db.Column(db.DateTime,default = datetime.now())
-    updated_at = db.Column(db.DateTime, onupdate = datetime.now())
+    created_at = db.Column(db.DateTime,default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
 
     def __init__(self,first_name,last_name,email,contact,password,user_type):
         self.first_name = first_name
@@ -0,0 +1,34 @@
+from flask import request, current_app
+
+
+# ?ids=1,2,3 on the detail endpoints: several rows for one round trip, read
+# with a single IN query. The response lists the rows in the order the ids
+# were asked for and the ids that were not found.
+
+class InvalidIdsRequest(ValueError):
+    pass
+
+
+def get_ids_arg():
+    max_ids = current_app.config.get("MULTI_GET_MAX_IDS", 100)
+
+    raw = request.args.get("ids", "")
+    try:
+        ids = [int(part) for part in raw.split(",") if part.strip()]
+    except ValueError:
+        raise InvalidIdsRequest("ids must be a comma separated list of integers")
+
+    if not ids:
+        raise InvalidIdsRequest("ids is required, e.g. ?ids=1,2,3")
+    if len(ids) > max_ids:
+        raise InvalidIdsRequest(f"at most {max_ids} ids per request")
+
+    # duplicates are returned once
+    return list(dict.fromkeys(ids))
+
+
+def in_request_order(ids, found):
+    # found is {id: item}; returns (items, missing ids)
+    items = [found[key] for key in ids if key in found]
+    missing = [key for key in ids if key not in found]
+    return items, missing
@@ -0,0 +1,114 @@
+import base64
+import bisect
+import binascii
+import json
+
+from flask import request, current_app
+
+
+# Shared keyset (cursor) pagination used by all the list endpoints.
+# Pages are always ordered by primary key, the cursor only carries the last
+# key of the previous page, so a page never shifts when rows are inserted.
+
+class InvalidPageRequest(ValueError):
+    pass
+
+
+def encode_cursor(key):
+    raw = json.dumps({"k": key}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))["k"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise InvalidPageRequest("Invalid cursor")
+
+    if not isinstance(key, int) or isinstance(key, bool):
+        raise InvalidPageRequest("Invalid cursor")
+    return key
+
+
+def get_page_args():
+    default_limit = current_app.config.get("PAGINATION_DEFAULT_LIMIT", 50)
+    max_limit = current_app.config.get("PAGINATION_MAX_LIMIT", 100)
+
+    limit = request.args.get("limit", default_limit)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise InvalidPageRequest("limit must be an integer")
+
+    if limit < 1:
+        raise InvalidPageRequest("limit must be greater than 0")
+
+    # hard server side maximum, clients can't ask for more than this
+    limit = min(limit, max_limit)
+
+    after = request.args.get("after")
+    if after:
+        after = decode_cursor(after)
+    else:
+        after = None
+
+    return limit, after
+
+
+def paginate(query, key_column):
+    # Returns one page of the query and the cursor of the next page
+    # (None when this is the last page).
+    limit, after = get_page_args()
+
+    if after is not None:
+        query = query.filter(key_column > after)
+
+    # fetching one extra row tells us if there is a next page without a COUNT
+    items = query.order_by(key_column).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(getattr(items[-1], key_column.key))
+
+    return items, next_cursor
+
+
+def page_statement(stmt, key_column):
+    # Adds the filter, order and limit of the requested page to a select() of
+    # plain columns, the key column must be the last one selected. Returns the
+    # statement and the page size to pass to split_page() with its rows.
+    limit, after = get_page_args()
+
+    if after is not None:
+        stmt = stmt.where(key_column > after)
+
+    return stmt.order_by(key_column).limit(limit + 1), limit
+
+
+def split_page(rows, limit):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-1])
+
+    return rows, next_cursor
+
+
+def paginate_sorted(items, keys):
+    # Same as paginate() but over an in-memory list already sorted by key,
+    # keys[i] being the primary key of items[i].
+    limit, after = get_page_args()
+
+    start = 0
+    if after is not None:
+        start = bisect.bisect_right(keys, after)
+
+    page = items[start:start + limit]
+
+    next_cursor = None
+    if start + limit < len(items):
+        next_cursor = encode_cursor(keys[start + limit - 1])
+
+    return page, next_cursor
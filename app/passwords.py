@@ -0,0 +1,121 @@
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt as _bcrypt
+
+
+# Password hashing and checking run in a small pool of worker processes, so a
+# burst of logins only ties up the pool and never all the request workers.
+# The number of waiting jobs is capped, past that the request is turned away
+# with a 503 instead of queueing forever.
+
+class HashingPoolBusy(Exception):
+    pass
+
+
+def _to_bytes(value):
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    return value
+
+
+def _hash_password(password, rounds, prefix):
+    salt = _bcrypt.gensalt(rounds=rounds, prefix=prefix)
+    return _bcrypt.hashpw(password, salt).decode("utf-8")
+
+
+def _check_password(pw_hash, password):
+    return hmac.compare_digest(_bcrypt.hashpw(password, pw_hash), pw_hash)
+
+
+def hash_rounds(pw_hash):
+    # bcrypt hashes look like $2b$12$<salt+hash>, the second field is the cost
+    try:
+        return int(_to_bytes(pw_hash).split(b"$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def calibrate_rounds(budget_ms, min_rounds=10, max_rounds=16):
+    # Picks the highest cost whose hash still fits in the latency budget.
+    # Every extra round doubles the work, so we stop at the first one over.
+    rounds = min_rounds
+    for candidate in range(min_rounds, max_rounds + 1):
+        started = time.perf_counter()
+        _hash_password(b"calibration-password", candidate, b"2b")
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        if elapsed_ms > budget_ms:
+            break
+        rounds = candidate
+    return rounds
+
+
+class PasswordHasher:
+
+    def __init__(self):
+        self.rounds = 12
+        self.prefix = b"2b"
+        self.pool_size = 2
+        self.max_pending = 32
+        self.timeout = 10
+        self._pool = None
+        self._pool_pid = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.prefix = _to_bytes(app.config.get("BCRYPT_HASH_PREFIX", "2b"))
+        self.pool_size = app.config.get("PASSWORD_POOL_SIZE", self.pool_size)
+        self.max_pending = app.config.get("PASSWORD_POOL_MAX_PENDING", self.max_pending)
+        self.timeout = app.config.get("PASSWORD_POOL_TIMEOUT", self.timeout)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+        budget_ms = app.config.get("BCRYPT_LATENCY_BUDGET_MS")
+        if budget_ms:
+            app.config["BCRYPT_LOG_ROUNDS"] = calibrate_rounds(
+                budget_ms,
+                app.config.get("BCRYPT_MIN_ROUNDS", 10),
+                app.config.get("BCRYPT_MAX_ROUNDS", 16),
+            )
+        self.rounds = app.config.get("BCRYPT_LOG_ROUNDS", self.rounds)
+
+    def _get_pool(self):
+        # the pool is created on first use and again after a fork, a child
+        # process can't use the executor of its parent
+        pid = os.getpid()
+        if self._pool is None or self._pool_pid != pid:
+            with self._lock:
+                if self._pool is None or self._pool_pid != pid:
+                    self._pool = ProcessPoolExecutor(max_workers=self.pool_size)
+                    self._pool_pid = pid
+        return self._pool
+
+    def _run(self, func, *args):
+        if not self.pool_size:
+            return func(*args)
+
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolBusy("Too many password operations in progress, try again later")
+        try:
+            return self._get_pool().submit(func, *args).result(timeout=self.timeout)
+        finally:
+            self._slots.release()
+
+    def generate_password_hash(self, password):
+        if not password:
+            raise ValueError("Password must be non-empty.")
+        return self._run(_hash_password, _to_bytes(password), self.rounds, self.prefix)
+
+    def check_password_hash(self, pw_hash, password):
+        return self._run(_check_password, _to_bytes(pw_hash), _to_bytes(password))
+
+    def needs_rehash(self, pw_hash):
+        rounds = hash_rounds(pw_hash)
+        return rounds is not None and rounds < self.rounds
+
+
+password_hasher = PasswordHasher()
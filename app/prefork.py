@@ -0,0 +1,275 @@
+import logging
+import os
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from app.extensions import db
+
+
+# Pre-fork production server for run.py, standard library and werkzeug only.
+#
+# The master binds the socket and builds the app once, closes its database
+# connections, and forks the workers. Each worker accepts from the shared
+# socket with a fixed pool of threads, and only accepts while one of them is
+# free, so waiting connections stay in the kernel queue for idle workers.
+# Connections are closed after each response: put nginx (or another proxy)
+# in front for keep-alive and slow clients.
+#
+# Signals to the master:
+#   TERM / INT  graceful stop, workers finish what they are serving
+#   HUP         graceful reload: a fresh master (new code and config) is
+#               exec'd on the same socket and pid, starts its workers and
+#               then stops the old ones; nothing is refused in between.
+#               The new code is imported in a subprocess first, a broken
+#               deploy keeps the old workers running.
+#
+# A worker exits after max_requests (+ up to jitter, so they don't all
+# restart at once) to cap slow memory growth, and when the master is gone.
+
+log = logging.getLogger(__name__)
+
+LISTEN_FD_ENV = "PREFORK_LISTEN_FD"
+OLD_WORKERS_ENV = "PREFORK_OLD_WORKERS"
+CHECK_ENV = "PREFORK_CHECK"
+
+
+def parse_bind(bind):
+    host, _, port = bind.rpartition(":")
+    return host.strip("[]") or "0.0.0.0", int(port)
+
+
+def dispose_engines(app, close=True):
+    # close=False in a forked worker: drop the pool inherited from the
+    # master without closing connections it may still own
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
+
+
+class ClosingRequestHandler(WSGIRequestHandler):
+    # one request per connection, a pool thread is never held by an idle client
+    protocol_version = "HTTP/1.0"
+
+
+class WorkerServer(BaseWSGIServer):
+    multithread = True
+    multiprocess = True
+
+    def __init__(self, listen_socket, app, threads, max_requests, master_pid):
+        host, port = listen_socket.getsockname()[:2]
+        super().__init__(host, port, app, handler=ClosingRequestHandler, fd=listen_socket.fileno())
+        self.socket.setblocking(False)
+        self.pool = ThreadPoolExecutor(threads, thread_name_prefix="worker")
+        self.slots = threading.BoundedSemaphore(threads)
+        self.max_requests = max_requests
+        self.master_pid = master_pid
+        self.handled = 0
+        self.stopping = False
+
+    def serve(self):
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.socket, selectors.EVENT_READ)
+            while not self.stopping:
+                if os.getppid() != self.master_pid:
+                    log.warning("master is gone, stopping")
+                    break
+                if not self.slots.acquire(timeout=0.5):
+                    continue
+                if not self._accept(selector):
+                    self.slots.release()
+
+        # finish the requests in flight
+        self.pool.shutdown(wait=True)
+        self.server_close()
+
+    def _accept(self, selector):
+        if not selector.select(0.5):
+            return False
+        try:
+            request, client_address = self.socket.accept()
+        except (BlockingIOError, InterruptedError):
+            # another worker was faster
+            return False
+
+        request.setblocking(True)
+        self.pool.submit(self._process, request, client_address)
+        self.handled += 1
+        if self.max_requests and self.handled >= self.max_requests:
+            log.info("served %d requests, recycling", self.handled)
+            self.stopping = True
+        return True
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.slots.release()
+
+
+class PreforkServer:
+
+    def __init__(self, app, bind="0.0.0.0:5000", workers=None, threads=8, max_requests=0,
+                 max_requests_jitter=0, graceful_timeout=30, backlog=2048):
+        self.app = app
+        self.bind = bind
+        self.worker_count = workers or (os.cpu_count() or 1) * 2 + 1
+        self.threads = threads
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.backlog = backlog
+        self.workers = {}
+        self.socket = None
+        self._stopping = False
+        self._reloading = False
+
+    # master
+
+    def run(self):
+        if os.environ.get(CHECK_ENV):
+            # the app imported and built fine, that is all a reload checks
+            return
+
+        self.socket = self._listen()
+        dispose_engines(self.app)  # no connection may be shared with the workers
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+
+        log.info("master %d listening on %s, %d workers x %d threads",
+                 os.getpid(), self.bind, self.worker_count, self.threads)
+        self._spawn_missing()
+        self._retire_previous_generation()
+
+        while not self._stopping:
+            self._reap()
+            if self._reloading:
+                self._reloading = False
+                self._reload()
+            self._spawn_missing()
+            time.sleep(0.5)
+
+        self._stop_workers()
+        log.info("master %d stopped", os.getpid())
+
+    def _listen(self):
+        inherited = os.environ.pop(LISTEN_FD_ENV, None)
+        if inherited:
+            listen_socket = socket.socket(fileno=int(inherited))
+        else:
+            host, port = parse_bind(self.bind)
+            family = socket.AF_INET6 if ":" in host else socket.AF_INET
+            listen_socket = socket.socket(family, socket.SOCK_STREAM)
+            listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listen_socket.bind((host, port))
+            listen_socket.listen(self.backlog)
+        listen_socket.set_inheritable(True)
+        return listen_socket
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def _handle_reload(self, signum, frame):
+        self._reloading = True
+
+    def _spawn_missing(self):
+        while not self._stopping and len(self.workers) < self.worker_count:
+            pid = os.fork()
+            if pid == 0:
+                self._worker()
+            self.workers[pid] = time.monotonic()
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started = self.workers.pop(pid, None)
+            if started is None:
+                continue  # a worker of the previous generation
+            code = os.waitstatus_to_exitcode(status)
+            if code != 0:
+                log.warning("worker %d exited with %d", pid, code)
+                if time.monotonic() - started < 1:
+                    time.sleep(1)  # don't fork in a tight loop when workers crash on start
+
+    def _stop_workers(self):
+        for pid in self.workers:
+            self._signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in self.workers:
+            log.warning("worker %d did not stop in %ss, killing it", pid, self.graceful_timeout)
+            self._signal(pid, signal.SIGKILL)
+        while self.workers:
+            self._reap()
+            time.sleep(0.1)
+
+    def _reload(self):
+        argv = getattr(sys, "orig_argv", [sys.executable] + sys.argv)
+        check = subprocess.run(argv, env=dict(os.environ, **{CHECK_ENV: "1"}))
+        if check.returncode != 0:
+            log.error("reload aborted, the new code failed to start (exit %d)", check.returncode)
+            return
+
+        log.info("reloading master %d", os.getpid())
+        os.environ[LISTEN_FD_ENV] = str(self.socket.fileno())
+        os.environ[OLD_WORKERS_ENV] = ",".join(str(pid) for pid in self.workers)
+        os.execv(argv[0] if os.path.isabs(argv[0]) else sys.executable, argv)
+
+    def _retire_previous_generation(self):
+        # after a reload: the old workers are still our children, stop them
+        # now that the new ones are accepting
+        old = os.environ.pop(OLD_WORKERS_ENV, "")
+        for pid in filter(None, old.split(",")):
+            self._signal(int(pid), signal.SIGTERM)
+
+    def _signal(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    # worker
+
+    def _worker(self):
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)  # until the server is up
+            signal.signal(signal.SIGINT, signal.SIG_IGN)  # ctrl-c reaches the whole group, the master decides
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            dispose_engines(self.app, close=False)
+
+            max_requests = self.max_requests
+            if max_requests and self.max_requests_jitter:
+                max_requests += int.from_bytes(os.urandom(2), "little") % (self.max_requests_jitter + 1)
+
+            server = WorkerServer(self.socket, self.app, self.threads, max_requests, os.getppid())
+
+            def stop(signum, frame):
+                server.stopping = True
+
+            signal.signal(signal.SIGTERM, stop)
+            server.serve()
+        except Exception:
+            log.exception("worker %d failed", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
@@ -0,0 +1,82 @@
+from flask import request
+from sqlalchemy import select
+
+from app.extensions import db
+from app.pagination import page_statement, split_page
+
+
+# Column projection for the list endpoints.
+#
+# An endpoint declares its output as (output name, column) pairs, the same
+# shape the /export endpoints use. Only those columns are selected and the
+# JSON items are built straight from the row tuples, no ORM objects are
+# created, so unused columns (like the password hash) are never read.
+# Names with a dot are nested: "service.name" ends up in item["service"]["name"].
+#
+# Clients can narrow the output with ?fields=id,name; a group name such as
+# "service" selects all of its nested fields.
+
+class InvalidFieldsRequest(ValueError):
+    pass
+
+
+def selected_fields(schema):
+    fields = request.args.get("fields")
+    wanted = {name.strip() for name in (fields or "").split(",") if name.strip()}
+    if not wanted:
+        return schema
+
+    known = {name for name, _ in schema} | {name.partition(".")[0] for name, _ in schema}
+    unknown = wanted - known
+    if unknown:
+        raise InvalidFieldsRequest("unknown fields: " + ", ".join(sorted(unknown)))
+
+    return [(name, column) for name, column in schema
+            if name in wanted or name.partition(".")[0] in wanted]
+
+
+def row_builder(names):
+    # returns a function turning one row tuple into the output dict
+    if not any("." in name for name in names):
+        return lambda row: dict(zip(names, row))
+
+    def build(row):
+        item = {}
+        for name, value in zip(names, row):
+            group, _, key = name.partition(".")
+            if key:
+                item.setdefault(group, {})[key] = value
+            else:
+                item[name] = value
+        return item
+
+    return build
+
+
+def page_query(schema, key_column, joins=()):
+    # the select() of the requested page, its page size and the function
+    # building the items; joins are relationships to outer join for the
+    # nested fields
+    fields = selected_fields(schema)
+
+    # the key goes last, split_page reads the cursor from it
+    stmt = select(*[column for _, column in fields], key_column)
+    for relationship in joins:
+        stmt = stmt.outerjoin(relationship)
+
+    stmt, limit = page_statement(stmt, key_column)
+    return stmt, limit, row_builder([name for name, _ in fields])
+
+
+def project_page(schema, key_column, joins=()):
+    # one page of the projected schema and the cursor of the next page
+    stmt, limit, build = page_query(schema, key_column, joins)
+    rows, next_cursor = split_page(db.session.execute(stmt).all(), limit)
+    return [build(row) for row in rows], next_cursor
+
+
+async def project_page_async(session, schema, key_column, joins=()):
+    # the same on an AsyncSession, used by the asgi entry point
+    stmt, limit, build = page_query(schema, key_column, joins)
+    rows, next_cursor = split_page((await session.execute(stmt)).all(), limit)
+    return [build(row) for row in rows], next_cursor
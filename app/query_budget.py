@@ -0,0 +1,281 @@
+from collections import Counter
+
+import click
+from flask import current_app, g, jsonify, request, has_request_context
+from sqlalchemy import event
+
+from app.status_codes import HTTP_500_INTERNAL_SERVER_ERROR
+
+
+# Development/test guard against N+1 queries and query count creep.
+#
+# Routes declare how many SQL statements they may run with @query_budget(n).
+# With QUERY_GUARD set to "warn" or "raise" every statement of a request is
+# recorded; going over the budget, or running the same SQL text more than
+# N_PLUS_ONE_THRESHOLD times (a lazy load per row), is logged ("warn") or
+# turns the response into a 500 ("raise"). QUERY_GUARD None, the default,
+# adds no listeners at all. Streamed responses (the /export routes) run
+# their queries while the body is sent, they are checked when the response
+# closes; it is too late to turn those into a 500, "raise" logs them too.
+
+def query_budget(max_queries):
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def route_budget(app, endpoint):
+    view = app.view_functions.get(endpoint)
+    return getattr(view, "query_budget", None)
+
+
+def request_violations(app, endpoint, statements, extra_budget=0):
+    # returns a list of human readable problems for one request;
+    # extra_budget is what views run on behalf of this one may use (batches)
+    problems = []
+
+    budget = route_budget(app, endpoint)
+    if budget is not None:
+        budget += extra_budget
+    total = sum(statements.values())
+    if budget is not None and total > budget:
+        problems.append(f"{total} queries, budget is {budget}")
+
+    threshold = app.config.get("N_PLUS_ONE_THRESHOLD", 3)
+    for statement, count in statements.items():
+        if count >= threshold:
+            problems.append(f"suspected N+1, ran {count} times: {' '.join(statement.split())[:200]}")
+
+    return problems
+
+
+class QueryGuard:
+
+    def __init__(self):
+        # a list while check-query-budgets runs, every checked request adds
+        # (endpoint, statements, problems) to it
+        self.reports = None
+
+    def init_app(self, app, db):
+        mode = app.config.get("QUERY_GUARD")
+        if not mode:
+            return
+
+        app.before_request(self._start_request)
+        app.after_request(self._check_request)
+
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and "query_guard_statements" in g:
+            g.query_guard_statements[statement] += 1
+
+    def _start_request(self):
+        g.query_guard_statements = Counter()
+
+    def _check_request(self, response):
+        if "query_guard_statements" not in g or request.endpoint is None:
+            return response
+
+        statements = g.query_guard_statements
+        if response.is_streamed:
+            # the body has not run yet, count its queries when it is done
+            app = current_app._get_current_object()
+            method, endpoint, extra = request.method, request.endpoint, g.get("query_budget_extra", 0)
+            response.call_on_close(lambda: self._report(app, method, endpoint, statements, extra))
+            return response
+
+        response.headers["X-Query-Count"] = str(sum(statements.values()))
+        problems = self._report(current_app, request.method, request.endpoint, statements, g.get("query_budget_extra", 0))
+
+        if problems and current_app.config.get("QUERY_GUARD") == "raise":
+            response = jsonify({"error": "query guard", "endpoint": request.endpoint, "problems": problems})
+            response.status_code = HTTP_500_INTERNAL_SERVER_ERROR
+        return response
+
+    def _report(self, app, method, endpoint, statements, extra_budget):
+        problems = request_violations(app, endpoint, statements, extra_budget)
+        for problem in problems:
+            app.logger.warning("%s %s: %s", method, endpoint, problem)
+        if self.reports is not None:
+            self.reports.append((endpoint, Counter(statements), problems))
+        return problems
+
+
+query_guard = QueryGuard()
+
+
+# flask check-query-budgets
+#
+# Runs one request against every route on a scratch sqlite database with
+# QUERY_GUARD="raise" and fails if any of them breaks its budget or shows an
+# N+1 pattern. The requests then run again on a database --scale times
+# bigger: a route whose query count grows with the rows (a lazy load per
+# row that stays under the N+1 threshold on small pages too) fails as well.
+
+BUDGET_CHECK_PASSWORD = "budget-check-password"
+BUDGET_CHECK_VOLUMES = {"users": 20, "services": 10, "farmers": 10, "bookings": 50, "feedback": 50}
+
+
+def budget_check_requests():
+    # (method, path, json body), run in this order with user 1 logged in
+    from app.pagination import encode_cursor
+
+    page_2 = "?limit=5&after=" + encode_cursor(5)
+    return [
+        ("GET", "/", None),
+        ("GET", "/metrics", None),
+        ("POST", "/api/v1/auth/register", {"first_name": "Budget", "last_name": "Check", "contact": "0799999999",
+                                           "email": "budget@example.com", "password": BUDGET_CHECK_PASSWORD, "user_type": "user"}),
+        ("POST", "/api/v1/auth/login", {"email": "user2@example.com", "password": BUDGET_CHECK_PASSWORD}),
+        ("POST", "/api/v1/auth/token/refresh", "refresh"),
+        ("GET", "/api/v1/users/", None),
+        ("GET", "/api/v1/users/" + page_2, None),
+        ("GET", "/api/v1/users/user/2", None),
+        ("GET", "/api/v1/users/user?ids=2,3,4", None),
+        ("GET", "/api/v1/users/search?query=a", None),
+        ("GET", "/api/v1/users/export", None),
+        ("PUT", "/api/v1/users/edit/1", {"last_name": "Checked"}),
+        ("GET", "/api/v1/services/", None),
+        ("GET", "/api/v1/services/" + page_2, None),
+        ("GET", "/api/v1/services/service/2", None),
+        ("GET", "/api/v1/services/service?ids=2,3,4", None),
+        ("GET", "/api/v1/services/2/ratings", None),
+        ("GET", "/api/v1/services/cache/stats", None),
+        ("GET", "/api/v1/services/export", None),
+        ("POST", "/api/v1/services/create", {"name": "Budget service", "price": 10, "description": "d", "category": "c"}),
+        ("PUT", "/api/v1/services/edit/2", {"price": 20}),
+        ("DELETE", "/api/v1/services/delete/3", None),
+        ("GET", "/api/v1/farmers/", None),
+        ("GET", "/api/v1/farmers/" + page_2, None),
+        ("GET", "/api/v1/farmers/farmer/2", None),
+        ("GET", "/api/v1/farmers/farmer?ids=2,3,4", None),
+        ("GET", "/api/v1/farmers/search?crop=coffee", None),
+        ("GET", "/api/v1/farmers/export", None),
+        ("POST", "/api/v1/farmers/create", {"name": "Budget farmer", "location": "Gulu", "crops_grown": "maize"}),
+        ("PUT", "/api/v1/farmers/edit/1", {"location": "Budget check"}),
+        ("DELETE", "/api/v1/farmers/delete/3", None),
+        ("GET", "/api/v1/bookings/", None),
+        ("GET", "/api/v1/bookings/" + page_2, None),
+        ("GET", "/api/v1/bookings/booking/2", None),
+        ("GET", "/api/v1/bookings/booking?ids=2,3,4", None),
+        ("GET", "/api/v1/bookings/export", None),
+        ("POST", "/api/v1/bookings/create", {"status": "budget-check", "service_id": 2}),
+        ("GET", "/api/v1/feedbacks/", None),
+        ("GET", "/api/v1/feedbacks/" + page_2, None),
+        ("GET", "/api/v1/feedbacks/feedbacks/2", None),
+        ("GET", "/api/v1/feedbacks/feedbacks?ids=2,3,4", None),
+        ("POST", "/api/v1/batch", [
+            {"method": "GET", "path": "/api/v1/services/service/2"},
+            {"method": "GET", "path": "/api/v1/users/user/2"},
+            {"method": "GET", "path": "/api/v1/bookings/booking/2"},
+        ]),
+        ("GET", "/api/v1/feedbacks/export", None),
+        ("GET", "/api/v1/feedbacks/buffer/stats", None),
+        ("POST", "/api/v1/feedbacks/feedback", {"farmer_id": 2, "service_id": 2, "rating": 4}),
+        ("PUT", "/api/v1/feedbacks/edit/2", {"rating": 5}),
+        ("DELETE", "/api/v1/feedbacks/feedbacks/3", None),
+        ("DELETE", "/api/v1/users/delete/1", None),
+        ("POST", "/api/v1/auth/logout", None),
+    ]
+
+
+def run_budget_check(volumes=None, database_uri=None, on_ready=None):
+    # returns (results, endpoints with no budget); results are
+    # (method, path, endpoint, status, query count, problems, statements)
+    # tuples, statements a Counter of the SQL text the request ran.
+    # database_uri must point at an empty scratch database, it is seeded and
+    # written to; on_ready(app) is called once it is seeded.
+    import os
+    import tempfile
+
+    from app import create_app
+    from app.extensions import db
+    from app.seed import seed_database
+    from app.catalog_cache import service_catalog
+    from app.auth_cache import identity_cache
+    from app.user_search import user_search_index
+    from app.farmer_index import farmer_index
+
+    path = os.path.join(tempfile.mkdtemp(), "query_budget.db")
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": database_uri or "sqlite:///" + path,
+        "SQLALCHEMY_REPLICA_URIS": [],
+        "QUERY_GUARD": "raise",
+        "PASSWORD_POOL_SIZE": 0,
+        "BCRYPT_LATENCY_BUDGET_MS": None,
+        "BCRYPT_LOG_ROUNDS": 4,
+    })
+    with app.app_context():
+        db.create_all(bind_key=None)
+        seed_database(**(volumes or BUDGET_CHECK_VOLUMES),
+                      password=BUDGET_CHECK_PASSWORD)
+
+    # the caches are per process, a second run in this process must not
+    # serve what the previous database held
+    service_catalog.invalidate()
+    identity_cache.clear()
+    user_search_index.built_at = None
+    farmer_index.built_at = None
+    if on_ready is not None:
+        on_ready(app)
+
+    client = app.test_client()
+    login = client.post("/api/v1/auth/login", json={"email": "user1@example.com", "password": BUDGET_CHECK_PASSWORD})
+    tokens = {
+        "access": login.get_json()["user"]["access_token"],
+        "refresh": login.get_json()["user"]["refresh_token"],
+    }
+
+    results = []
+    query_guard.reports = []
+    try:
+        for method, path, body in budget_check_requests():
+            token = tokens["refresh"] if body == "refresh" else tokens["access"]
+            response = client.open(path, method=method, json=None if body == "refresh" else body,
+                                   headers={"Authorization": "Bearer " + token})
+            response.get_data()
+            response.close()  # a streamed body is counted when it closes
+
+            endpoint, statements, problems = query_guard.reports[-1] if query_guard.reports else (None, Counter(), [])
+            query_guard.reports.clear()
+            results.append((method, path, endpoint, response.status_code, sum(statements.values()), problems, statements))
+    finally:
+        query_guard.reports = None
+
+    # every route needs a budget, not only the ones requested above; static
+    # is flask's own file route
+    unbudgeted = sorted(
+        endpoint for endpoint, view in app.view_functions.items()
+        if endpoint != "static" and getattr(view, "query_budget", None) is None
+    )
+    return results, unbudgeted
+
+
+@click.command("check-query-budgets")
+@click.option("--scale", default=4, show_default=True, help="Data volume multiplier of the second run, 1 skips it.")
+def check_query_budgets_command(scale):
+    """Fail if a route goes over its query budget or shows an N+1 pattern."""
+    results, unbudgeted = run_budget_check()
+    scaled = [None] * len(results)
+    if scale > 1:
+        scaled, _ = run_budget_check({table: rows * scale for table, rows in BUDGET_CHECK_VOLUMES.items()})
+
+    failures = 0
+    for result, scaled_result in zip(results, scaled):
+        method, path, endpoint, status, count, problems, statements = result
+        if scaled_result is not None and scaled_result[4] != count:
+            problems = problems + [f"{count} queries, {scaled_result[4]} with {scale}x the rows"]
+        click.echo(f"{'FAIL' if problems else 'ok':<6}{status:>4}{count:>4}  {method:<7}{path}")
+        for problem in problems:
+            click.echo(f"{'':<12}{problem}")
+        failures += bool(problems)
+
+    for endpoint in unbudgeted:
+        click.echo(f"no budget declared for {endpoint}")
+
+    if failures or unbudgeted:
+        raise click.ClickException(f"{failures} routes over budget, {len(unbudgeted)} without a budget")
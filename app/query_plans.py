@@ -0,0 +1,109 @@
+from datetime import datetime
+
+import click
+from flask import has_request_context, request
+from sqlalchemy import event
+
+from app.extensions import db
+from app.query_budget import run_budget_check
+from app.revocation import revocation_list
+
+
+# Query plan regression checks: EXPLAIN every statement the endpoints run and
+# fail when one of them reads a whole table. Run it after touching a model,
+# a query or a migration:
+#
+#   flask check-query-plans
+#   flask check-query-plans --database-uri mysql+pymysql://root:@localhost/plans_scratch
+#
+# The statements are not written out here: the check-query-budgets requests
+# are run on a scratch database (sqlite unless --database-uri names an empty
+# one of the production kind) and every SELECT, UPDATE and DELETE they run is
+# explained with the parameters it ran with, including the ones background
+# threads (revocation sync, index builds) run meanwhile. Reads that take the
+# whole table on purpose, exports and in-memory index loads, are executed
+# with execution_options(full_scan=True) and skipped.
+
+EXPLAINED = ("SELECT", "UPDATE", "DELETE")
+
+
+def recorded_statements(database_uri=None):
+    # {sql: (endpoint, parameters, engine)}, the first run of each statement
+    statements = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if executemany or context.execution_options.get("full_scan"):
+            return
+        if statement.lstrip().split(None, 1)[0].upper() not in EXPLAINED:
+            return
+        endpoint = request.endpoint if has_request_context() else "background"
+        statements.setdefault(statement, (endpoint or "-", parameters, conn.engine))
+
+    apps = []
+
+    def on_ready(app):
+        apps.append(app)
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, "before_cursor_execute", record)
+
+    run_budget_check(database_uri=database_uri, on_ready=on_ready)
+
+    # the revocation list's own queries run on a timer or before it has
+    # loaded, the requests above may not reach them; run them once
+    with apps[0].app_context():
+        revocation_list._lookup("query-plan-check")
+        revocation_list._sync(datetime.now())
+        revocation_list._prune()
+    return statements
+
+
+def _explain(connection, sql, parameters):
+    dialect = connection.dialect
+
+    if dialect.name == "sqlite":
+        rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, parameters).all()
+        plan = [row[-1] for row in rows]
+        full_scans = [step for step in plan if step.startswith("SCAN ")]
+        # the first rows of a table in index order (a first list page): sqlite
+        # says SCAN, but only LIMIT rows are read
+        words = sql.upper().split()
+        if "LIMIT" in words and "WHERE" not in words and not any("TEMP B-TREE" in step for step in plan):
+            full_scans = []
+    elif dialect.name == "mysql":
+        result = connection.exec_driver_sql("EXPLAIN " + sql, parameters)
+        rows = [dict(zip(result.keys(), row)) for row in result]
+        plan = [f"{row['table']}: type={row['type']} key={row['key']}" for row in rows]
+        full_scans = [step for step, row in zip(plan, rows) if row["type"] == "ALL"]
+    else:
+        raise click.ClickException(f"EXPLAIN checks are not written for {dialect.name}")
+
+    return plan, full_scans
+
+
+def check_query_plans(database_uri=None):
+    # returns a list of (endpoint, sql, plan, full scans) for every statement
+    results = []
+    for sql, (endpoint, parameters, engine) in recorded_statements(database_uri).items():
+        with engine.connect() as connection:
+            plan, full_scans = _explain(connection, sql, parameters)
+        results.append((endpoint, sql, plan, full_scans))
+    return sorted(results, key=lambda result: result[0])
+
+
+@click.command("check-query-plans")
+@click.option("--verbose", is_flag=True, help="Print the plan of every query.")
+@click.option("--database-uri", help="An empty scratch database to run on, sqlite when left out.")
+def check_query_plans_command(verbose, database_uri):
+    """Fail if any endpoint query plan falls back to a full table scan."""
+    failures = 0
+    for endpoint, sql, plan, full_scans in check_query_plans(database_uri):
+        status = "FULL SCAN" if full_scans else "ok"
+        click.echo(f"{status:<10}{endpoint:<40}{' '.join(sql.split())[:100]}")
+        if full_scans or verbose:
+            for step in plan:
+                click.echo(f"{'':<10}  {step}")
+        failures += bool(full_scans)
+
+    if failures:
+        raise click.ClickException(f"{failures} queries regressed to a full table scan")
@@ -0,0 +1,117 @@
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import case, func, insert, select, update, delete
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models.feedback import Feedback
+from app.models.service_rating_stats import ServiceRatingStats
+
+
+# Per service rating summary (count, sum, 1-5 histogram) kept in step with the
+# feedbacks table. The feedback handlers call record_rating() before they
+# commit, so the summary and the feedback change land in the same transaction.
+
+RATINGS = range(1, 6)
+
+
+def _counted(rating):
+    # legacy ratings outside 1-5 are left out of the summary, as the
+    # backfill and rebuild_rating_stats() leave them out
+    return rating if isinstance(rating, int) and rating in RATINGS else None
+
+
+def _deltas(old_rating, new_rating):
+    old_rating, new_rating = _counted(old_rating), _counted(new_rating)
+    values = {}
+    count_delta = 0
+    sum_delta = 0
+    if old_rating is not None:
+        count_delta -= 1
+        sum_delta -= old_rating
+        values[f"rating_{old_rating}"] = -1
+    if new_rating is not None:
+        count_delta += 1
+        sum_delta += new_rating
+        values[f"rating_{new_rating}"] = values.get(f"rating_{new_rating}", 0) + 1
+    values["rating_count"] = count_delta
+    values["rating_sum"] = sum_delta
+    return values
+
+
+def record_rating(service_id, old_rating=None, new_rating=None):
+    # old_rating None means a new feedback, new_rating None a deleted one
+    deltas = _deltas(old_rating, new_rating)
+    if any(deltas.values()):
+        _apply(service_id, deltas)
+
+
+def record_new_ratings(ratings):
+    # many new feedbacks at once, (service_id, rating) pairs; the deltas are
+    # summed so every service gets a single UPDATE, in service order so two
+    # workers doing this never wait on each other's rows in a cycle
+    totals = {}
+    for service_id, rating in ratings:
+        service_totals = totals.setdefault(service_id, {})
+        for name, delta in _deltas(None, rating).items():
+            service_totals[name] = service_totals.get(name, 0) + delta
+
+    for service_id in sorted(totals):
+        if any(totals[service_id].values()):
+            _apply(service_id, totals[service_id])
+
+
+def _apply(service_id, deltas):
+    columns = ServiceRatingStats.__table__.c
+
+    # relative UPDATE so concurrent feedbacks never overwrite each other
+    stmt = (
+        update(ServiceRatingStats)
+        .where(columns.service_id == service_id)
+        .values({name: columns[name] + delta for name, delta in deltas.items()})
+    )
+    if db.session.execute(stmt).rowcount:
+        return
+
+    # first feedback for this service, create its row; if another request
+    # created it in the meantime fall back to the update
+    try:
+        with db.session.begin_nested():
+            initial = {f"rating_{rating}": 0 for rating in RATINGS}
+            initial.update({name: max(delta, 0) for name, delta in deltas.items()})
+            db.session.execute(insert(ServiceRatingStats).values(service_id=service_id, **initial))
+    except IntegrityError:
+        db.session.execute(stmt)
+
+
+def rebuild_rating_stats():
+    # recomputes every summary row from the feedbacks table in one pass
+    rated = Feedback.rating.in_(list(RATINGS))
+    aggregate = (
+        select(
+            Feedback.service_id,
+            func.count(Feedback.feedback_id),
+            func.coalesce(func.sum(Feedback.rating), 0),
+            *[func.sum(case((Feedback.rating == rating, 1), else_=0)) for rating in RATINGS],
+            func.now(),
+        )
+        .where(Feedback.service_id.isnot(None), rated)
+        .group_by(Feedback.service_id)
+    )
+
+    db.session.execute(delete(ServiceRatingStats))
+    db.session.execute(
+        insert(ServiceRatingStats).from_select(
+            ["service_id", "rating_count", "rating_sum"] + [f"rating_{rating}" for rating in RATINGS] + ["updated_at"],
+            aggregate,
+        )
+    )
+    db.session.commit()
+
+
+@click.command("rebuild-rating-stats")
+@with_appcontext
+def rebuild_rating_stats_command():
+    """Recompute service_rating_stats from the feedbacks table."""
+    rebuild_rating_stats()
+    click.echo(f"Rebuilt rating stats for {ServiceRatingStats.query.count()} services")
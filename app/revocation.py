@@ -0,0 +1,251 @@
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import jsonify
+
+from app.extensions import db
+from app.status_codes import HTTP_503_SERVICE_UNAVAILABLE
+
+
+# Revoked tokens (logout) without a blocklist query per request.
+#
+# The revoked_tokens table is the source of truth. Every worker process keeps
+# a Bloom filter of the revoked jtis in front of an exact set of them: most
+# tokens were never revoked and are cleared by a few bit checks, the rare
+# filter hit is settled by the exact set. Neither touches the database.
+#
+# A background thread per process loads the unexpired rows at startup (only
+# jti and expiry, streamed), then every REVOCATION_SYNC_SECONDS pulls the rows
+# revoked since its last look, so a logout in one worker reaches the others
+# within about that long. The worker that handles the logout adds the jti
+# right away. Every REVOCATION_PRUNE_SECONDS rows for tokens that have expired
+# anyway are deleted and the filter is rebuilt from what is left, a Bloom
+# filter can't forget single entries.
+#
+# Until the first load succeeds each check asks the table instead, right away
+# once a load has failed. When that lookup fails too the token is refused
+# with a 503 (RevocationUnavailable), never let through unchecked.
+
+log = logging.getLogger(__name__)
+
+# tokens made without an exp are kept until then
+NEVER_EXPIRES = datetime(9999, 12, 31)
+
+
+def token_expiry(decoded_token):
+    if "exp" not in decoded_token:
+        return NEVER_EXPIRES
+    return datetime.fromtimestamp(decoded_token["exp"])
+
+
+class RevocationUnavailable(Exception):
+    pass
+
+
+class BloomFilter:
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # double hashing, two 64 bit halves of one digest give all k positions
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationList:
+
+    def __init__(self):
+        self.sync_interval = 1
+        self.prune_interval = 3600
+        self.error_rate = 0.001
+        self.startup_timeout = 10
+        self.app = None
+        self.syncs = 0
+        self.pruned = 0
+        self.bloom_hits = 0
+        self.false_positives = 0
+        self._exact = {}
+        self._bloom = BloomFilter(1024, self.error_rate)
+        self._ready = threading.Event()
+        self._attempted = threading.Event()  # the first load ran, failed or not
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app, jwt):
+        self.sync_interval = app.config.get("REVOCATION_SYNC_SECONDS", self.sync_interval)
+        self.prune_interval = app.config.get("REVOCATION_PRUNE_SECONDS", self.prune_interval)
+        self.error_rate = app.config.get("REVOCATION_FALSE_POSITIVE_RATE", self.error_rate)
+        self.app = app
+
+        @jwt.token_in_blocklist_loader
+        def token_is_revoked(jwt_header, jwt_payload):
+            return self.is_revoked(jwt_payload["jti"])
+
+        @app.errorhandler(RevocationUnavailable)
+        def revocation_unavailable(e):
+            return jsonify({"error": str(e)}), HTTP_503_SERVICE_UNAVAILABLE
+
+    # checking
+
+    def is_revoked(self, jti):
+        self._ensure_started()
+        if not self._ready.is_set():
+            # wait for the first load, but not again once it has failed
+            self._attempted.wait(self.startup_timeout)
+            if not self._ready.is_set():
+                return self._lookup(jti)
+
+        if jti not in self._bloom:
+            return False
+        self.bloom_hits += 1
+        if jti in self._exact:
+            return True
+        self.false_positives += 1
+        return False
+
+    def _lookup(self, jti):
+        from app.models.revoked_token import RevokedToken
+
+        try:
+            return db.session.execute(
+                db.select(RevokedToken.id).where(RevokedToken.jti == jti)
+            ).first() is not None
+        except Exception:
+            db.session.rollback()
+            log.exception("revoked token lookup failed")
+            raise RevocationUnavailable("can't check the token right now, try again")
+
+    def add(self, jti, expires_at):
+        # after the revoked_tokens row is committed, so this worker does not
+        # wait for its next sync
+        with self._lock:
+            self._add(jti, expires_at)
+
+    def _add(self, jti, expires_at):
+        if jti in self._exact:
+            return
+        self._exact[jti] = expires_at
+        if self._bloom.count >= self._bloom.capacity:
+            self._rebuild_filter()
+        else:
+            self._bloom.add(jti)
+
+    def _rebuild_filter(self):
+        bloom = BloomFilter(max(1024, len(self._exact) * 2), self.error_rate)
+        for jti in self._exact:
+            bloom.add(jti)
+        self._bloom = bloom
+
+    # background loading
+
+    def _ensure_started(self):
+        # the thread does not survive a fork, start one per process; what was
+        # loaded before the fork is kept and synced from there
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    threading.Thread(target=self._run, name="revocation-sync", daemon=True).start()
+                    self._pid = os.getpid()
+
+    def _run(self):
+        synced_from = None
+        pruned_at = time.monotonic()
+        while True:
+            try:
+                with self.app.app_context():
+                    if not self._ready.is_set():
+                        synced_from = self._load()
+                        self._ready.set()
+                    else:
+                        synced_from = self._sync(synced_from)
+                    if time.monotonic() - pruned_at > self.prune_interval:
+                        self._prune()
+                        pruned_at = time.monotonic()
+            except Exception:
+                log.exception("revocation list sync failed")
+            self._attempted.set()
+            time.sleep(self.sync_interval)
+
+    def _load(self):
+        from app.models.revoked_token import RevokedToken
+
+        started = datetime.now()
+        stmt = db.select(RevokedToken.jti, RevokedToken.expires_at).where(RevokedToken.expires_at > started)
+        exact = {jti: expires_at for jti, expires_at in db.session.execute(stmt.execution_options(yield_per=10000))}
+        db.session.remove()
+
+        with self._lock:
+            # keep what add() put in while we were loading
+            exact.update(self._exact)
+            self._exact = exact
+            self._rebuild_filter()
+        return started
+
+    def _sync(self, synced_from):
+        from app.models.revoked_token import RevokedToken
+
+        # rows are read again for a few seconds, a revoke committed late
+        # with an earlier revoked_at is not missed
+        started = datetime.now()
+        stmt = db.select(RevokedToken.jti, RevokedToken.expires_at).where(
+            RevokedToken.revoked_at >= synced_from - timedelta(seconds=10)
+        )
+        rows = db.session.execute(stmt).all()
+        db.session.remove()
+
+        with self._lock:
+            for jti, expires_at in rows:
+                self._add(jti, expires_at)
+            self.syncs += 1
+        return started
+
+    def _prune(self):
+        from app.models.revoked_token import RevokedToken
+
+        now = datetime.now()
+        result = db.session.execute(db.delete(RevokedToken).where(RevokedToken.expires_at <= now))
+        db.session.commit()
+        db.session.remove()
+
+        with self._lock:
+            self._exact = {jti: expires_at for jti, expires_at in self._exact.items() if expires_at > now}
+            self._rebuild_filter()
+            self.pruned += result.rowcount
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ready": self._ready.is_set(),
+                "revoked": len(self._exact),
+                "filter_bits": self._bloom.size,
+                "filter_hashes": self._bloom.hashes,
+                "bloom_hits": self.bloom_hits,
+                "false_positives": self.false_positives,
+                "syncs": self.syncs,
+                "pruned": self.pruned,
+            }
+
+
+revocation_list = RevocationList()
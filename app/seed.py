@@ -0,0 +1,201 @@
+import random
+import time
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, insert, select
+
+from app.extensions import db
+from app.passwords import password_hasher
+from app.models.user import User
+from app.models.service import Service
+from app.models.farmer import Farmer
+from app.models.booking import Booking
+from app.models.feedback import Feedback
+
+
+# Bulk synthetic data for local testing and benchmarks.
+# Rows are generated in memory and written with chunked multi-row INSERTs
+# (executemany), one transaction per chunk. Primary keys are assigned here,
+# continuing after the current max id, so the foreign keys of bookings and
+# feedback always point at rows that exist. Every fake user shares one
+# precomputed password hash.
+
+FIRST_NAMES = ["Nahia", "Amos", "Grace", "Brian", "Sarah", "Joseph", "Mary", "Peter", "Ruth", "Isaac",
+               "Esther", "Daniel", "Agnes", "Moses", "Joan", "Ronald", "Sylvia", "Henry", "Irene", "Patrick"]
+LAST_NAMES = ["Mugisha", "Nakato", "Okello", "Tumusiime", "Namutebi", "Kato", "Atuhaire", "Byaruhanga",
+              "Nansubuga", "Ssempijja", "Akello", "Kiggundu", "Asiimwe", "Ochieng", "Nabirye", "Mwesigye"]
+LOCATIONS = ["Mbarara", "Gulu", "Kampala", "Masaka", "Mbale", "Lira", "Hoima", "Kabale", "Jinja", "Arua"]
+CROPS = ["coffee", "maize", "beans", "bananas", "cassava", "tea", "sorghum", "groundnuts", "rice", "millet"]
+CATEGORIES = ["consulting", "training", "soil testing", "irrigation", "marketing", "finance"]
+STATUSES = ["pending", "confirmed", "completed", "cancelled"]
+
+DEFAULT_PASSWORD = "password123"
+
+
+def _next_id(column):
+    return (db.session.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+def _id_picker(column, seeded, rng, what):
+    # ids written by this run are a contiguous range, otherwise pick from
+    # the ids already in the table (there may be gaps)
+    if seeded:
+        first, last = seeded
+        return lambda: rng.randint(first, last)
+
+    ids = db.session.execute(select(column)).scalars().all()
+    if not ids:
+        raise click.ClickException(f"no {what} to reference, seed some first")
+    return lambda: rng.choice(ids)
+
+
+def _insert_chunks(model, rows, chunk_size):
+    table = model.__table__
+    written = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            with db.engine.begin() as connection:
+                connection.execute(insert(table), chunk)
+            written += len(chunk)
+            chunk = []
+    if chunk:
+        with db.engine.begin() as connection:
+            connection.execute(insert(table), chunk)
+        written += len(chunk)
+    return written
+
+
+def user_rows(first_id, count, password, rng, now):
+    for user_id in range(first_id, first_id + count):
+        yield {
+            "user_id": user_id,
+            "first_name": rng.choice(FIRST_NAMES),
+            "last_name": rng.choice(LAST_NAMES),
+            "email": f"user{user_id}@example.com",
+            "contact": f"07{user_id:08d}",
+            "password": password,
+            "user_type": "user",
+            "created_at": now,
+            "updated_at": now,
+        }
+
+
+def service_rows(first_id, count, rng, now):
+    for service_id in range(first_id, first_id + count):
+        yield {
+            "service_id": service_id,
+            "name": f"Service {service_id}",
+            "description": "Generated service",
+            "price": float(rng.randrange(10, 500) * 1000),
+            "category": rng.choice(CATEGORIES),
+            "created_at": now,
+            "updated_at": now,
+        }
+
+
+def farmer_rows(first_id, count, rng, now):
+    for farmer_id in range(first_id, first_id + count):
+        yield {
+            "farmer_id": farmer_id,
+            "name": f"Farmer {farmer_id}",
+            "location": rng.choice(LOCATIONS),
+            "crops_grown": ", ".join(rng.sample(CROPS, rng.randint(1, 3))),
+            "created_at": now,
+            "updated_at": now,
+        }
+
+
+def booking_rows(first_id, count, pick_user, pick_service, rng, now):
+    for booking_id in range(first_id, first_id + count):
+        yield {
+            "booking_id": booking_id,
+            "user_id": pick_user(),
+            "service_id": pick_service(),
+            # unique per user, createbooking refuses two bookings with the same status
+            "status": f"{rng.choice(STATUSES)}-{booking_id}",
+            "created_at": now,
+            "updated_at": now,
+        }
+
+
+def feedback_rows(first_id, count, pick_farmer, pick_service, rng, now):
+    for feedback_id in range(first_id, first_id + count):
+        yield {
+            "feedback_id": feedback_id,
+            "farmer_id": pick_farmer(),
+            "service_id": pick_service(),
+            "rating": rng.randint(1, 5),
+            "comment": "Generated feedback",
+            "created_at": now,
+            "updated_at": now,
+        }
+
+
+def seed_database(users=0, services=0, farmers=0, bookings=0, feedback=0,
+                  seed=42, chunk_size=10000, password=DEFAULT_PASSWORD, report=None):
+    # returns {table: rows written}; bookings and feedback reference the
+    # existing users/services/farmers, including the ones written here
+    rng = random.Random(seed)
+    now = datetime.now()
+    report = report or (lambda table, rows, seconds: None)
+    written = {}
+    seeded = {}
+
+    def run(table, model, key_column, count, make_rows):
+        first_id = _next_id(key_column)
+        started = time.perf_counter()
+        written[table] = _insert_chunks(model, make_rows(first_id), chunk_size)
+        seeded[table] = (first_id, first_id + count - 1)
+        report(table, written[table], time.perf_counter() - started)
+
+    if users:
+        password_hash = password_hasher.generate_password_hash(password)
+        run("users", User, User.user_id, users,
+            lambda first_id: user_rows(first_id, users, password_hash, rng, now))
+    if services:
+        run("services", Service, Service.service_id, services,
+            lambda first_id: service_rows(first_id, services, rng, now))
+    if farmers:
+        run("farmers", Farmer, Farmer.farmer_id, farmers,
+            lambda first_id: farmer_rows(first_id, farmers, rng, now))
+
+    if bookings:
+        pick_user = _id_picker(User.user_id, seeded.get("users"), rng, "users")
+        pick_service = _id_picker(Service.service_id, seeded.get("services"), rng, "services")
+        run("bookings", Booking, Booking.booking_id, bookings,
+            lambda first_id: booking_rows(first_id, bookings, pick_user, pick_service, rng, now))
+    if feedback:
+        pick_farmer = _id_picker(Farmer.farmer_id, seeded.get("farmers"), rng, "farmers")
+        pick_service = _id_picker(Service.service_id, seeded.get("services"), rng, "services")
+        run("feedbacks", Feedback, Feedback.feedback_id, feedback,
+            lambda first_id: feedback_rows(first_id, feedback, pick_farmer, pick_service, rng, now))
+
+        from app.rating_stats import rebuild_rating_stats
+        rebuild_rating_stats()
+
+    db.session.commit()
+    return written
+
+
+@click.command("seed")
+@click.option("--users", default=1000, show_default=True)
+@click.option("--services", default=100, show_default=True)
+@click.option("--farmers", default=500, show_default=True)
+@click.option("--bookings", default=5000, show_default=True)
+@click.option("--feedback", default=2000, show_default=True)
+@click.option("--seed", "seed_value", default=42, show_default=True, help="random seed, same seed same data")
+@click.option("--chunk-size", default=10000, show_default=True, help="rows per INSERT batch")
+@click.option("--password", default=DEFAULT_PASSWORD, show_default=True, help="password of every fake user")
+@with_appcontext
+def seed_command(users, services, farmers, bookings, feedback, seed_value, chunk_size, password):
+    """Fill the database with generated users, services, farmers, bookings and feedback."""
+    def report(table, rows, seconds):
+        rate = rows / seconds * 60 if seconds else 0
+        click.echo(f"{table:<10}{rows:>12,} rows in {seconds:6.1f}s ({rate:,.0f} rows/min)")
+
+    seed_database(users, services, farmers, bookings, feedback,
+                  seed=seed_value, chunk_size=chunk_size, password=password, report=report)
@@ -0,0 +1,98 @@
+import json
+import os
+import subprocess
+import sys
+
+import click
+
+
+# Cold start report: runs create_app() in a fresh interpreter the way a web
+# worker does (no flask command, so no migrations or CLI modules) with
+# python -X importtime, and breaks the time down per module and per top
+# level package. Compare two runs to catch an import that made workers,
+# serverless functions or autoscaled instances slower to start:
+#
+#   flask startup-profile --top 30
+#   flask startup-profile --json > before.json
+
+PROFILE_SCRIPT = """
+import time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app()
+done = time.perf_counter()
+print("STARTUP", imported - started, done - imported)
+"""
+
+
+def parse_importtime(stderr):
+    # [(module, self seconds, cumulative seconds, depth)] in import order
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6, depth))
+    return modules
+
+
+def run_profile(root):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROFILE_SCRIPT],
+        cwd=root, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise click.ClickException(f"create_app() failed:\n{result.stderr[-2000:]}")
+
+    startup = next(line for line in result.stdout.splitlines() if line.startswith("STARTUP"))
+    import_seconds, factory_seconds = (float(value) for value in startup.split()[1:])
+
+    modules = parse_importtime(result.stderr)
+    packages = {}
+    for name, self_seconds, _, _ in modules:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_seconds
+
+    return {
+        "python": sys.version.split()[0],
+        "import_seconds": import_seconds,
+        "create_app_seconds": factory_seconds,
+        "modules_imported": len(modules),
+        "modules": [
+            {"module": name, "self_seconds": self_seconds, "cumulative_seconds": cumulative, "depth": depth}
+            for name, self_seconds, cumulative, depth in modules
+        ],
+        "packages": dict(sorted(packages.items(), key=lambda item: -item[1])),
+    }
+
+
+@click.command("startup-profile")
+@click.option("--top", default=25, show_default=True, help="modules to list")
+@click.option("--sort", "sort_by", type=click.Choice(["cumulative", "self"]), default="cumulative", show_default=True)
+@click.option("--json", "as_json", is_flag=True, help="print the whole report as JSON")
+def startup_profile_command(top, sort_by, as_json):
+    """Report how long a worker takes to import and build the app."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    report = run_profile(root)
+
+    if as_json:
+        click.echo(json.dumps(report, indent=2))
+        return
+
+    click.echo(f"import app          {report['import_seconds'] * 1000:9.1f} ms")
+    click.echo(f"create_app()        {report['create_app_seconds'] * 1000:9.1f} ms")
+    click.echo(f"modules imported    {report['modules_imported']:9d}")
+
+    click.echo("\nby package (self time)")
+    for package, seconds in list(report["packages"].items())[:15]:
+        click.echo(f"  {seconds * 1000:9.1f} ms  {package}")
+
+    key = "cumulative_seconds" if sort_by == "cumulative" else "self_seconds"
+    click.echo(f"\ntop {top} modules by {sort_by} time")
+    click.echo(f"  {'self ms':>9}{'cumul ms':>10}  module")
+    for module in sorted(report["modules"], key=lambda module: -module[key])[:top]:
+        click.echo(f"  {module['self_seconds'] * 1000:9.1f}{module['cumulative_seconds'] * 1000:10.1f}  "
+                   f"{'  ' * module['depth']}{module['module']}")
@@ -0,0 +1,184 @@
+import heapq
+import threading
+import time
+
+from app.extensions import db
+
+
+# In-memory trigram index over user names for /api/v1/users/search.
+# Every first and last name is split into 3 letter grams and each gram keeps
+# the set of user ids containing it. A query is answered by intersecting the
+# posting sets of its own grams and checking the few candidates left, instead
+# of an ILIKE '%q%' scan over the whole users table.
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _rank(query, first_name, last_name):
+    # lower is better: exact name, then name prefix, then anywhere in the name
+    best = 3
+    for name in (first_name, last_name):
+        if name == query:
+            return 0
+        if name.startswith(query):
+            best = min(best, 1)
+        elif query in name:
+            best = min(best, 2)
+    return best
+
+
+class UserSearchIndex:
+
+    def __init__(self):
+        self.refresh_interval = None
+        self.built_at = None
+        self._app = None
+        self._docs = {}
+        self._postings = {}
+        self._lock = threading.RLock()
+        self._rebuilding = False
+        self._refreshing = False
+        self._replay = []
+
+    def init_app(self, app):
+        self._app = app
+        self.refresh_interval = app.config.get("USER_SEARCH_REFRESH_SECONDS")
+
+    # index maintenance
+
+    def _add(self, docs, postings, user_id, first_name, last_name, user_type):
+        first_name = (first_name or "").lower()
+        last_name = (last_name or "").lower()
+        docs[user_id] = (first_name, last_name, user_type)
+        for gram in trigrams(first_name) | trigrams(last_name):
+            postings.setdefault(gram, set()).add(user_id)
+
+    def _remove(self, docs, postings, user_id):
+        doc = docs.pop(user_id, None)
+        if doc is None:
+            return
+        for gram in trigrams(doc[0]) | trigrams(doc[1]):
+            ids = postings.get(gram)
+            if ids is not None:
+                ids.discard(user_id)
+                if not ids:
+                    del postings[gram]
+
+    def _apply(self, op, args):
+        if op == "remove":
+            self._remove(self._docs, self._postings, *args)
+        else:
+            self._remove(self._docs, self._postings, args[0])
+            self._add(self._docs, self._postings, *args)
+
+    def _record(self, op, args):
+        with self._lock:
+            if self._rebuilding:
+                self._replay.append((op, args))
+            if self.built_at is not None:
+                self._apply(op, args)
+
+    def add_user(self, user):
+        self._record("add", (user.user_id, user.first_name, user.last_name, user.user_type))
+
+    update_user = add_user
+
+    def remove_user(self, user_id):
+        self._record("remove", (user_id,))
+
+    def build(self, batch_size=10000):
+        # Loads every user in one streamed pass and swaps the new index in.
+        # Writes that land while we are loading are replayed on top of it.
+        from app.models.user import User
+
+        with self._lock:
+            self._rebuilding = True
+            self._replay = []
+
+        try:
+            docs = {}
+            postings = {}
+            stmt = db.select(User.user_id, User.first_name, User.last_name, User.user_type)
+            # full_scan: the whole table on purpose, check-query-plans skips it
+            result = db.session.execute(stmt.execution_options(yield_per=batch_size, full_scan=True))
+            for row in result:
+                self._add(docs, postings, *row)
+
+            with self._lock:
+                self._docs = docs
+                self._postings = postings
+                for op, args in self._replay:
+                    self._apply(op, args)
+                self.built_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._rebuilding = False
+                self._replay = []
+
+    def _rebuild_in_background(self):
+        try:
+            with self._app.app_context():
+                self.build()
+        finally:
+            self._refreshing = False
+
+    def ensure_built(self):
+        if self.built_at is None:
+            with self._lock:
+                if self.built_at is None:
+                    self.build()
+            return
+
+        # an old index keeps serving while a fresh one is loaded, this picks
+        # up writes made by other worker processes
+        stale = (
+            self.refresh_interval is not None
+            and time.monotonic() - self.built_at > self.refresh_interval
+        )
+        if stale and not self._refreshing and self._app is not None:
+            with self._lock:
+                if self._refreshing:
+                    return
+                self._refreshing = True
+            threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+
+    # querying
+
+    def _candidates(self, query):
+        grams = trigrams(query)
+        if not grams:
+            # shorter than a trigram, nothing to intersect with
+            return self._docs.keys()
+
+        posting_sets = []
+        for gram in grams:
+            ids = self._postings.get(gram)
+            if not ids:
+                return ()
+            posting_sets.append(ids)
+
+        posting_sets.sort(key=len)
+        return posting_sets[0].intersection(*posting_sets[1:])
+
+    def search(self, query, user_type="user", offset=0, limit=50):
+        # returns (user ids of the page, total number of matches)
+        self.ensure_built()
+        query = query.lower()
+
+        with self._lock:
+            docs = self._docs
+            matches = []
+            for user_id in self._candidates(query):
+                first_name, last_name, doc_type = docs[user_id]
+                if user_type is not None and doc_type != user_type:
+                    continue
+                rank = _rank(query, first_name, last_name)
+                if rank < 3:
+                    matches.append((rank, len(first_name) + len(last_name), user_id))
+
+        page = heapq.nsmallest(offset + limit, matches)[offset:]
+        return [user_id for _, _, user_id in page], len(matches)
+
+
+user_search_index = UserSearchIndex()
@@ -0,0 +1,167 @@
+import os
+import queue
+import threading
+import time
+
+from sqlalchemy import insert
+
+from app.extensions import db
+from app.metrics import Histogram
+from app.rating_stats import record_new_ratings
+
+
+# Group commit for feedback inserts (opt-in, FEEDBACK_GROUP_COMMIT).
+#
+# Requests put their row on a queue and wait. One background thread per
+# worker process takes what is queued, up to FEEDBACK_BATCH_MAX_ROWS rows or
+# FEEDBACK_BATCH_MAX_WAIT_MS after the first one, and writes the whole batch
+# (one multi-row INSERT plus the rating summary updates) in one transaction.
+# Every request is released only once its batch has committed, so a 201 still
+# means the feedback is on disk; many requests just share one commit.
+# If a batch fails its rows are retried one by one, so a bad row only fails
+# its own request. Past FEEDBACK_BUFFER_MAX_PENDING queued rows requests get
+# a 503 instead of queueing forever.
+
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+FLUSH_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class FeedbackBufferFull(Exception):
+    pass
+
+
+class _Pending:
+    __slots__ = ("row", "done", "error")
+
+    def __init__(self, row):
+        self.row = row
+        self.done = threading.Event()
+        self.error = None
+
+
+class FeedbackWriteBuffer:
+
+    def __init__(self):
+        self.enabled = False
+        self.max_rows = 200
+        self.max_wait = 0.02
+        self.max_pending = 5000
+        self.timeout = 30
+        self.app = None
+        self.batches = 0
+        self.rows = 0
+        self.failed_batches = 0
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.flush_seconds = Histogram(FLUSH_BUCKETS)
+        self._queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get("FEEDBACK_GROUP_COMMIT", False)
+        self.max_rows = app.config.get("FEEDBACK_BATCH_MAX_ROWS", self.max_rows)
+        self.max_wait = app.config.get("FEEDBACK_BATCH_MAX_WAIT_MS", self.max_wait * 1000) / 1000
+        self.max_pending = app.config.get("FEEDBACK_BUFFER_MAX_PENDING", self.max_pending)
+        self.app = app
+
+    # requests
+
+    def _get_queue(self):
+        # the flusher thread does not survive a fork, start one per process
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                    threading.Thread(target=self._run, name="feedback-flusher", daemon=True).start()
+                    self._pid = os.getpid()
+        return self._queue
+
+    def submit(self, row):
+        # blocks until the row is committed, raises what the write raised
+        pending_queue = self._get_queue()
+        if pending_queue.qsize() >= self.max_pending:
+            raise FeedbackBufferFull("Too many feedbacks waiting to be saved, try again shortly")
+
+        pending = _Pending(row)
+        pending_queue.put(pending)
+        if not pending.done.wait(self.timeout):
+            raise TimeoutError("feedback was not saved in time")
+        if pending.error is not None:
+            raise pending.error
+
+    # flushing
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _write(self, rows):
+        from app.models.feedback import Feedback
+
+        db.session.execute(insert(Feedback), rows)
+        record_new_ratings([(row["service_id"], row["rating"]) for row in rows])
+        db.session.commit()
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        failed = False
+        with self.app.app_context():
+            try:
+                self._write([pending.row for pending in batch])
+            except Exception:
+                failed = True
+                db.session.rollback()
+                for pending in batch:
+                    try:
+                        self._write([pending.row])
+                    except Exception as e:
+                        db.session.rollback()
+                        pending.error = e
+
+        with self._lock:
+            self.batches += 1
+            self.rows += len(batch)
+            self.failed_batches += failed
+            self.batch_sizes.observe(len(batch))
+            self.flush_seconds.observe(time.perf_counter() - started)
+
+        for pending in batch:
+            pending.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+                "batches": self.batches,
+                "rows": self.rows,
+                "failed_batches": self.failed_batches,
+                "average_batch_size": round(self.rows / self.batches, 2) if self.batches else 0,
+                "average_flush_ms": round(self.flush_seconds.sum / self.batches * 1000, 3) if self.batches else 0,
+            }
+
+    def metric_lines(self):
+        # prometheus text lines for /metrics
+        with self._lock:
+            lines = [
+                "# TYPE feedback_buffer_queue_depth gauge",
+                f"feedback_buffer_queue_depth {self._queue.qsize() if self._queue is not None else 0}",
+                "# TYPE feedback_buffer_batch_size histogram",
+                *self.batch_sizes.lines("feedback_buffer_batch_size", ""),
+                "# TYPE feedback_buffer_flush_seconds histogram",
+                *self.flush_seconds.lines("feedback_buffer_flush_seconds", ""),
+            ]
+        return lines
+
+
+feedback_buffer = FeedbackWriteBuffer()
@@ -0,0 +1,5 @@
+from app.async_app import create_asgi_app   # asyncio alternative to run.py
+
+# serve with an ASGI server, e.g.
+#   uvicorn asgi:application --port 5000
+application = create_asgi_app()
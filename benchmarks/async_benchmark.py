@@ -0,0 +1,194 @@
+# Sync (WSGI, fixed worker threads) vs async (asgi.py under uvicorn) serving.
+#
+# Starts each mode in its own process on a seeded database, then keeps
+# --concurrency requests in flight against the list endpoints and reports
+# throughput and latency percentiles. A local sqlite file answers in
+# microseconds, so the difference shows best against a real MySQL server,
+# where most of a request is spent waiting on the network:
+#
+#   python benchmarks/async_benchmark.py --concurrency 500 --requests 20000 \
+#       --database-uri mysql+pymysql://root:@localhost/yucca_bench --reuse
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PATHS = [
+    "/api/v1/users/",
+    "/api/v1/farmers/",
+    "/api/v1/bookings/",
+    "/api/v1/feedbacks/",
+]
+
+
+def app_config(uri):
+    return {
+        "SQLALCHEMY_DATABASE_URI": uri,
+        "PASSWORD_POOL_SIZE": 0,
+        "BCRYPT_LATENCY_BUDGET_MS": None,
+        "METRICS_ENABLED": False,
+    }
+
+
+# servers, each one runs in a child process
+
+def serve_sync(uri, port, threads):
+    from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+    from app import create_app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    class PooledWSGIServer(BaseWSGIServer):
+        # a fixed number of worker threads, like a threaded production server
+        request_queue_size = 1024
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.pool = ThreadPoolExecutor(threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._process, request, client_address)
+
+        def _process(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    PooledWSGIServer("127.0.0.1", port, create_app(app_config(uri)), handler=QuietHandler).serve_forever()
+
+
+def serve_async(uri, port):
+    import uvicorn
+    from app.async_app import create_asgi_app
+
+    uvicorn.run(create_asgi_app(app_config(uri)), host="127.0.0.1", port=port, log_level="warning")
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+# load
+
+async def one_request(port, path):
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    status = int(data.split(b" ", 2)[1]) if data else 0
+    return time.perf_counter() - started, status
+
+
+async def run_load(port, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(number):
+        async with semaphore:
+            try:
+                return await one_request(port, PATHS[number % len(PATHS)])
+            except OSError:
+                return None, 0
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(limited(number) for number in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency, status in results if status == 200)
+    errors = sum(1 for _, status in results if status != 200)
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] if latencies else 0
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(pct(50), 2),
+        "p95_ms": round(pct(95), 2),
+        "p99_ms": round(pct(99), 2),
+        "mean_ms": round(statistics.mean(latencies), 2) if latencies else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the sync and the asgi serving modes.")
+    parser.add_argument("--database-uri", help="defaults to a fresh sqlite file")
+    parser.add_argument("--reuse", action="store_true", help="the database is already seeded")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--farmers", type=int, default=5000)
+    parser.add_argument("--services", type=int, default=1000)
+    parser.add_argument("--bookings", type=int, default=20000)
+    parser.add_argument("--feedback", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--threads", type=int, default=8, help="worker threads of the sync server")
+    parser.add_argument("--port", type=int, default=8601)
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    uri = args.database_uri or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "async_benchmark.db")
+    if not args.reuse:
+        from app import create_app
+        from app.extensions import db
+        from app.seed import seed_database
+
+        app = create_app(app_config(uri))
+        with app.app_context():
+            db.create_all(bind_key=None)
+            seed_database(users=args.users, services=args.services, farmers=args.farmers,
+                          bookings=args.bookings, feedback=args.feedback)
+            db.engine.dispose()
+
+    context = multiprocessing.get_context("spawn")
+    modes = [
+        ("sync", serve_sync, (uri, args.port, args.threads)),
+        ("async", serve_async, (uri, args.port + 1)),
+    ]
+
+    results = {}
+    print(f"{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, target, target_args in modes:
+        server = context.Process(target=target, args=target_args, daemon=True)
+        server.start()
+        try:
+            port = target_args[1]
+            wait_for_port(port)
+            asyncio.run(run_load(port, min(200, args.requests), args.concurrency))  # warm up
+            result = results[name] = asyncio.run(run_load(port, args.requests, args.concurrency))
+        finally:
+            server.terminate()
+            server.join()
+        print(f"{name:<8}{result['throughput_rps']:>10.1f}{result['p50_ms']:>10.2f}"
+              f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['errors']:>8}")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"concurrency": args.concurrency, "threads": args.threads, "modes": results}, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+# Endpoint benchmark for create_app().
+#
+# Builds the app against a file backed sqlite database seeded by app.seed with
+# synthetic data, drives every blueprint route through the Flask test client at a fixed
+# concurrency and reports p50/p95/p99 latency, throughput and peak RSS per
+# endpoint. Results are written as JSON so two runs can be compared:
+#
+#   python benchmarks/endpoint_benchmark.py --users 1000000 --services 100000 \
+#       --bookings 5000000 --output before.json
+#   python benchmarks/endpoint_benchmark.py --reuse --output after.json --compare before.json
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.extensions import db
+from app.seed import CROPS, FIRST_NAMES, LOCATIONS, seed_database
+from app.models.user import User
+from app.models.service import Service
+from app.models.farmer import Farmer
+from app.models.booking import Booking
+from app.models.feedback import Feedback
+
+PASSWORD = "benchmark-password"
+
+
+# routes
+
+def routes(volumes, counter):
+    # (name, method, path factory, json body factory, needs auth)
+    def pick(table):
+        return random.randint(1, volumes[table])
+
+    def unique():
+        return next(counter)
+
+    return [
+        ("auth.register", "POST", lambda: "/api/v1/auth/register", lambda: {
+            "first_name": "Bench", "last_name": "User", "contact": f"08{unique():08d}",
+            "email": f"bench{unique()}@example.com", "password": PASSWORD, "user_type": "user"}, False),
+        ("auth.login", "POST", lambda: "/api/v1/auth/login", lambda: {
+            "email": f"user{pick('users')}@example.com", "password": PASSWORD}, False),
+        ("auth.refresh", "POST", lambda: "/api/v1/auth/token/refresh", None, "refresh"),
+        ("users.list", "GET", lambda: "/api/v1/users/", None, False),
+        ("users.detail", "GET", lambda: f"/api/v1/users/user/{pick('users')}", None, True),
+        ("users.search", "GET", lambda: f"/api/v1/users/search?query={random.choice(FIRST_NAMES)}", None, True),
+        ("users.edit", "PUT", lambda: "/api/v1/users/edit/1", lambda: {"last_name": f"Last{unique()}"}, True),
+        ("users.delete", "DELETE", lambda: f"/api/v1/users/delete/{pick('users')}", None, True),
+        ("users.export", "GET", lambda: "/api/v1/users/export?format=csv", None, True),
+        ("services.list", "GET", lambda: "/api/v1/services/", None, False),
+        ("services.detail", "GET", lambda: f"/api/v1/services/service/{pick('services')}", None, True),
+        ("services.ratings", "GET", lambda: f"/api/v1/services/{pick('services')}/ratings", None, False),
+        ("services.create", "POST", lambda: "/api/v1/services/create", lambda: {
+            "name": f"Bench service {unique()}", "price": 10, "description": "d", "category": "c"}, True),
+        ("services.edit", "PUT", lambda: f"/api/v1/services/edit/{pick('services')}", lambda: {"price": 20}, True),
+        ("services.export", "GET", lambda: "/api/v1/services/export", None, True),
+        ("farmers.list", "GET", lambda: "/api/v1/farmers/", None, False),
+        ("farmers.detail", "GET", lambda: f"/api/v1/farmers/farmer/{pick('farmers')}", None, True),
+        ("farmers.search", "GET", lambda: f"/api/v1/farmers/search?crop={random.choice(CROPS)}&location={random.choice(LOCATIONS)}", None, True),
+        ("farmers.create", "POST", lambda: "/api/v1/farmers/create", lambda: {
+            "name": f"Bench farmer {unique()}", "location": random.choice(LOCATIONS), "crops_grown": random.choice(CROPS)}, True),
+        ("farmers.edit", "PUT", lambda: "/api/v1/farmers/edit/1", lambda: {"location": random.choice(LOCATIONS)}, True),
+        ("farmers.export", "GET", lambda: "/api/v1/farmers/export", None, True),
+        ("bookings.list", "GET", lambda: "/api/v1/bookings/", None, False),
+        ("bookings.detail", "GET", lambda: f"/api/v1/bookings/booking/{pick('bookings')}", None, True),
+        ("bookings.create", "POST", lambda: "/api/v1/bookings/create", lambda: {
+            "status": f"bench{unique()}", "service_id": pick("services")}, True),
+        ("bookings.export", "GET", lambda: "/api/v1/bookings/export", None, True),
+        ("feedback.list", "GET", lambda: "/api/v1/feedbacks/", None, False),
+        ("feedback.create", "POST", lambda: "/api/v1/feedbacks/feedback", lambda: {
+            "farmer_id": pick("farmers"), "service_id": pick("services"), "rating": random.randint(1, 5)}, True),
+        ("feedback.detail", "GET", lambda: f"/api/v1/feedbacks/feedbacks/{pick('feedback')}", None, True),
+        ("feedback.edit", "PUT", lambda: f"/api/v1/feedbacks/edit/{pick('feedback')}", lambda: {"comment": "edited"}, True),
+        ("feedback.export", "GET", lambda: "/api/v1/feedbacks/export", None, True),
+    ]
+
+
+# measuring
+
+def _current_rss_kb():
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class RssSampler(threading.Thread):
+
+    def __init__(self, interval=0.01):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_kb = _current_rss_kb()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.is_set():
+            self.peak_kb = max(self.peak_kb, _current_rss_kb())
+            time.sleep(self.interval)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        return self.peak_kb
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_endpoint(app, route, tokens, requests, concurrency):
+    name, method, make_path, make_body, needs_auth = route
+    local = threading.local()
+
+    def one_request(_):
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        headers = {}
+        if needs_auth:
+            headers["Authorization"] = "Bearer " + tokens["refresh" if needs_auth == "refresh" else "access"]
+        body = make_body() if make_body else None
+
+        started = time.perf_counter()
+        response = local.client.open(make_path(), method=method, json=body, headers=headers)
+        response.get_data()
+        return (time.perf_counter() - started) * 1000, response.status_code
+
+    sampler = RssSampler()
+    sampler.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one_request, range(requests)))
+    elapsed = time.perf_counter() - started
+    peak_kb = sampler.stop()
+
+    latencies = [latency for latency, _ in results]
+    statuses = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    return {
+        "requests": requests,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(statistics.mean(latencies), 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+        "statuses": statuses,
+    }
+
+
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)["endpoints"]
+
+    regressions = []
+    print(f"\n{'endpoint':<20}{'p95 before':>12}{'p95 after':>12}{'change':>10}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        change = (result["p95_ms"] - before["p95_ms"]) / max(before["p95_ms"], 0.001)
+        flag = "  REGRESSION" if change > tolerance else ""
+        print(f"{name:<20}{before['p95_ms']:>12.2f}{result['p95_ms']:>12.2f}{change:>+10.0%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every route of create_app().")
+    parser.add_argument("--database", default=os.path.join(tempfile.gettempdir(), "yucca_benchmark.db"))
+    parser.add_argument("--reuse", action="store_true", help="use the already seeded --database")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--services", type=int, default=1000)
+    parser.add_argument("--farmers", type=int, default=5000)
+    parser.add_argument("--bookings", type=int, default=50000)
+    parser.add_argument("--feedback", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--only", help="comma separated endpoint names to run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="earlier results file to compare p95 latency with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 slowdown before failing")
+    args = parser.parse_args()
+
+    volumes = {
+        "users": args.users, "services": args.services, "farmers": args.farmers,
+        "bookings": args.bookings, "feedback": args.feedback,
+    }
+    random.seed(args.seed)
+
+    if not args.reuse and os.path.exists(args.database):
+        os.remove(args.database)
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + args.database})
+
+    with app.app_context():
+        if not args.reuse:
+            db.create_all()
+            started = time.perf_counter()
+            seed_database(**volumes, seed=args.seed, password=PASSWORD)
+            print(f"seeded {sum(volumes.values())} rows in {time.perf_counter() - started:.1f}s")
+        else:
+            volumes = {
+                "users": User.query.count(), "services": Service.query.count(), "farmers": Farmer.query.count(),
+                "bookings": Booking.query.count(), "feedback": Feedback.query.count(),
+            }
+
+    login = app.test_client().post("/api/v1/auth/login", json={"email": "user1@example.com", "password": PASSWORD})
+    tokens = {
+        "access": login.get_json()["user"]["access_token"],
+        "refresh": login.get_json()["user"]["refresh_token"],
+    }
+
+    # next() on itertools.count is atomic, the worker threads can share it
+    counter = itertools.count()
+
+    selected = set(args.only.split(",")) if args.only else None
+    results = {}
+    print(f"{'endpoint':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'rss MB':>10}  statuses")
+    for route in routes(volumes, counter):
+        if selected and route[0] not in selected:
+            continue
+        result = run_endpoint(app, route, tokens, args.requests, args.concurrency)
+        results[route[0]] = result
+        print(f"{route[0]:<20}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+              f"{result['throughput_rps']:>10.1f}{result['peak_rss_mb']:>10.1f}  {result['statuses']}")
+
+    with open(args.output, "w") as output:
+        json.dump({
+            "meta": {
+                "timestamp": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "volumes": volumes,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+            },
+            "endpoints": results,
+        }, output, indent=2)
+    print(f"\nresults written to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            sys.exit(f"p95 regressions: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# ORM loop vs column projection for the list endpoints.
+#
+# Serializes the same rows two ways, the way the list handlers used to
+# (Model.query.all() and copying attributes into dicts) and through
+# app.projection (select() of the listed columns, dicts built from row
+# tuples), and reports CPU time and peak Python memory per 10k rows:
+#
+#   python benchmarks/projection_benchmark.py --rows 100000
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.extensions import db
+from app.seed import seed_database
+from app.projection import project_page
+from app.models.farmer import Farmer
+from app.models.user import User
+from app.controllers.farmer.farmer_controller import FARMER_LIST_FIELDS
+from app.controllers.users.user_controller import USER_LIST_FIELDS
+
+
+def orm_farmers():
+    return [{
+        "id": farmer.farmer_id,
+        "name": farmer.name,
+        "location": farmer.location,
+        "crops_grown": farmer.crops_grown,
+        "created_at": farmer.created_at,
+    } for farmer in Farmer.query.order_by(Farmer.farmer_id).all()]
+
+
+def orm_users():
+    return [{
+        "id": user.user_id,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "username": user.get_full_name(),
+        "email": user.email,
+        "contact": user.contact,
+        "type": user.user_type,
+        "created_at": user.created_at,
+    } for user in User.query.order_by(User.user_id).all()]
+
+
+def measure(app, rows, build, repeat):
+    cpu, peak = [], []
+    for _ in range(repeat):
+        with app.test_request_context(f"/?limit={rows}"):
+            tracemalloc.start()
+            started = time.process_time()
+            items = build()
+            cpu.append(time.process_time() - started)
+            peak.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            assert len(items) == rows, len(items)
+            db.session.remove()
+
+    per_10k = 10000 / rows
+    return statistics.median(cpu) * 1000 * per_10k, statistics.median(peak) / 1024 / 1024 * per_10k
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ORM list serialization with column projection.")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    database = os.path.join(tempfile.mkdtemp(), "projection_benchmark.db")
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + database,
+        "PAGINATION_MAX_LIMIT": args.rows,
+        "PASSWORD_POOL_SIZE": 0,
+        "BCRYPT_LATENCY_BUDGET_MS": None,
+    })
+
+    with app.app_context():
+        db.create_all(bind_key=None)
+        seed_database(users=args.rows, farmers=args.rows)
+
+    cases = [
+        ("farmers", orm_farmers, lambda: project_page(FARMER_LIST_FIELDS, Farmer.farmer_id)[0]),
+        ("users", orm_users, lambda: project_page(USER_LIST_FIELDS, User.user_id)[0]),
+    ]
+
+    print(f"{'list':<10}{'way':<12}{'cpu ms/10k':>12}{'peak MB/10k':>13}")
+    for name, orm, projected in cases:
+        for way, build in (("orm", orm), ("projected", projected)):
+            cpu_ms, peak_mb = measure(app, args.rows, build, args.repeat)
+            print(f"{name:<10}{way:<12}{cpu_ms:>12.1f}{peak_mb:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# Duplicate create race for the unique keys.
+#
+# Fires --concurrency identical create requests at once for every create
+# endpoint and checks that exactly one of them got a 201, the rest got the
+# endpoint's duplicate error, and the table holds one row for the key.
+# Before the keys were unique the SELECT-then-INSERT checks let several of
+# these through. Exits non-zero when a check fails:
+#
+#   python benchmarks/unique_create_race.py --concurrency 32 --rounds 5
+#   python benchmarks/unique_create_race.py --database-uri mysql+pymysql://root:@localhost/yucca_race
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select
+
+from app import create_app
+from app.extensions import db
+from app.seed import seed_database
+from app.models.user import User
+from app.models.service import Service
+from app.models.farmer import Farmer
+from app.models.booking import Booking
+
+PASSWORD = "race-password"
+
+
+def creates(round_number):
+    # (name, path, json body, duplicate status, count statement, needs auth)
+    key = f"race{round_number}"
+    return [
+        ("auth.register (email)", "/api/v1/auth/register", lambda n: {
+            "first_name": "Race", "last_name": "User", "contact": f"09{round_number:04d}{n:04d}",
+            "email": f"{key}@example.com", "password": PASSWORD, "user_type": "user"}, 409,
+         select(func.count()).select_from(User).where(User.email == f"{key}@example.com"), False),
+        ("auth.register (contact)", "/api/v1/auth/register", lambda n: {
+            "first_name": "Race", "last_name": "User", "contact": f"08{round_number:08d}",
+            "email": f"{key}-{n}@example.com", "password": PASSWORD, "user_type": "user"}, 409,
+         select(func.count()).select_from(User).where(User.contact == f"08{round_number:08d}"), False),
+        ("services.create", "/api/v1/services/create", lambda n: {
+            "name": f"Race service {key}", "price": 10, "description": "d", "category": "c"}, 400,
+         select(func.count()).select_from(Service).where(Service.name == f"Race service {key}"), True),
+        ("farmers.create", "/api/v1/farmers/create", lambda n: {
+            "name": f"Race farmer {key}", "location": "district1", "crops_grown": "coffee"}, 400,
+         select(func.count()).select_from(Farmer).where(Farmer.name == f"Race farmer {key}"), True),
+        ("bookings.create", "/api/v1/bookings/create", lambda n: {
+            "status": key, "service_id": 1}, 400,
+         select(func.count()).select_from(Booking).where(Booking.user_id == 1, Booking.status == key), True),
+    ]
+
+
+def race(app, path, make_body, headers, concurrency):
+    # every thread waits on the barrier so the requests really overlap
+    barrier = threading.Barrier(concurrency)
+    statuses = [None] * concurrency
+
+    def worker(n):
+        client = app.test_client()
+        barrier.wait()
+        statuses[n] = client.post(path, json=make_body(n), headers=headers).status_code
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return Counter(statuses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Race identical creates against the unique keys.")
+    parser.add_argument("--database-uri", help="defaults to a fresh sqlite file")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    uri = args.database_uri or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "unique_create_race.db")
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": uri,
+        "PASSWORD_POOL_SIZE": 0,
+        "BCRYPT_LATENCY_BUDGET_MS": None,
+        "BCRYPT_LOG_ROUNDS": 4,
+        "METRICS_ENABLED": False,
+    })
+    with app.app_context():
+        db.create_all(bind_key=None)
+        seed_database(users=1, services=1, password=PASSWORD)
+
+    login = app.test_client().post("/api/v1/auth/login", json={"email": "user1@example.com", "password": PASSWORD})
+    headers = {"Authorization": "Bearer " + login.get_json()["user"]["access_token"]}
+
+    failures = 0
+    for round_number in range(args.rounds):
+        for name, path, make_body, duplicate_status, count, needs_auth in creates(round_number):
+            statuses = race(app, path, make_body, headers if needs_auth else {}, args.concurrency)
+            with app.app_context():
+                rows = db.session.execute(count).scalar()
+
+            ok = statuses[201] == 1 and statuses[duplicate_status] == args.concurrency - 1 and rows == 1
+            failures += not ok
+            print(f"{'ok' if ok else 'FAIL':<6}{name:<26}rows={rows}  {dict(statuses)}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
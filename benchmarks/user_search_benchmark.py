@@ -0,0 +1,98 @@
+# Compares the trigram index behind /api/v1/users/search with the old
+# ILIKE '%q%' query (which loaded every match) on a throwaway sqlite database.
+#
+#   python benchmarks/user_search_benchmark.py --users 1000000
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import or_, insert
+
+from app import create_app
+from app.extensions import db
+from app.models.user import User
+from app.user_search import user_search_index
+
+FIRST_NAMES = ["Nahia", "Amos", "Grace", "Brian", "Sarah", "Joseph", "Mary", "Peter", "Ruth", "Isaac",
+               "Esther", "Daniel", "Agnes", "Moses", "Joan", "Ronald", "Sylvia", "Henry", "Irene", "Patrick"]
+LAST_NAMES = ["Mugisha", "Nakato", "Okello", "Tumusiime", "Namutebi", "Kato", "Atuhaire", "Byaruhanga",
+              "Nansubuga", "Ssempijja", "Akello", "Kiggundu", "Asiimwe", "Ochieng", "Nabirye", "Mwesigye"]
+
+
+def seed(count, batch_size=50000):
+    rng = random.Random(42)
+    rows = []
+    for i in range(1, count + 1):
+        rows.append({
+            "first_name": rng.choice(FIRST_NAMES) + str(rng.randrange(1000)),
+            "last_name": rng.choice(LAST_NAMES),
+            "email": f"user{i}@example.com",
+            "contact": f"07{i:08d}",
+            "password": "x",
+            "user_type": "user",
+        })
+        if len(rows) == batch_size:
+            db.session.execute(insert(User), rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(User), rows)
+    db.session.commit()
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "search_bench.db")
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + path,
+        "PASSWORD_POOL_SIZE": 0,
+        "BCRYPT_LATENCY_BUDGET_MS": None,
+    })
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        seed(args.users)
+        print(f"seeded {args.users} users in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        user_search_index.build()
+        print(f"built trigram index in {time.perf_counter() - started:.1f}s")
+
+        print(f"{'query':<12}{'matches':>10}{'ilike ms':>12}{'index ms':>12}")
+        for query in ["Nahia7", "mugisha", "grace12", "okel", "zzz"]:
+            def ilike():
+                return User.query.filter(
+                    or_(User.first_name.ilike(f"%{query}%"), User.last_name.ilike(f"%{query}%")),
+                    User.user_type == 'user',
+                ).all()
+
+            def indexed():
+                return user_search_index.search(query, limit=args.limit)
+
+            _, matches = indexed()
+            print(f"{query:<12}{matches:>10}{timed(ilike, args.repeat):>12.3f}{timed(indexed, args.repeat):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
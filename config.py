@@ -2,4 +2,89 @@ class Config:
 
    SQLALCHEMY_DATABASE_URI = 'mysql+pymysql://root:@localhost/yucca_ltd_db'
 
+   # blueprints to import and register, a worker serving part of the API
+   # can list only its own, e.g. ['auth', 'users']
+   BLUEPRINTS = ['auth', 'users', 'services', 'farmers', 'bookings', 'feedback', 'batch']
+
+   # POST /api/v1/batch runs at most this many requests, and the detail
+   # endpoints' ?ids= multi-get takes at most MULTI_GET_MAX_IDS ids
+   BATCH_MAX_REQUESTS = 20
+   MULTI_GET_MAX_IDS = 100
+
+   # python run.py serve: pre-fork workers (None is 2 x cpus + 1), each with
+   # SERVER_THREADS threads; a worker is replaced after SERVER_MAX_REQUESTS
+   # requests (plus up to the jitter) so memory growth stays capped
+   SERVER_BIND = '0.0.0.0:5000'
+   SERVER_WORKERS = None
+   SERVER_THREADS = 8
+   SERVER_MAX_REQUESTS = 10000
+   SERVER_MAX_REQUESTS_JITTER = 1000
+   SERVER_GRACEFUL_TIMEOUT = 30
+
+   # keyset pagination for the list endpoints
+   PAGINATION_DEFAULT_LIMIT = 50
+   PAGINATION_MAX_LIMIT = 100
+
+   # rows fetched per round trip by the streaming /export endpoints
+   EXPORT_BATCH_SIZE = 1000
+
+   # seconds before a worker reloads the service catalog even without a local
+   # write, so writes made in other worker processes are picked up
+   SERVICE_CACHE_TTL = 60
+
+   # bcrypt runs in a pool of worker processes, at most
+   # PASSWORD_POOL_MAX_PENDING jobs may wait before requests get a 503
+   PASSWORD_POOL_SIZE = 2
+   PASSWORD_POOL_MAX_PENDING = 32
+   # the cost factor is calibrated at startup to fit this per hash budget
+   BCRYPT_LATENCY_BUDGET_MS = 250
+   BCRYPT_MIN_ROUNDS = 10
+
+   # the user search index is rebuilt in the background after this many
+   # seconds so users written by other workers show up
+   USER_SEARCH_REFRESH_SECONDS = 300
+   FARMER_INDEX_REFRESH_SECONDS = 300
+
+   # group commit for new feedbacks: concurrent requests are written together
+   # in one transaction of up to FEEDBACK_BATCH_MAX_ROWS rows, collected for at
+   # most FEEDBACK_BATCH_MAX_WAIT_MS; each request still waits for its commit
+   FEEDBACK_GROUP_COMMIT = False
+   FEEDBACK_BATCH_MAX_ROWS = 200
+   FEEDBACK_BATCH_MAX_WAIT_MS = 20
+   FEEDBACK_BUFFER_MAX_PENDING = 5000
+
+   # verified JWT claims are cached until the token expires (0 turns it off),
+   # the logged-in user's profile for IDENTITY_CACHE_TTL seconds
+   JWT_CLAIMS_CACHE_SIZE = 10000
+   IDENTITY_CACHE_TTL = 30
+
+   # logged out tokens: every worker keeps them in memory and pulls new ones
+   # from the revoked_tokens table every REVOCATION_SYNC_SECONDS; rows of
+   # expired tokens are deleted every REVOCATION_PRUNE_SECONDS
+   REVOCATION_SYNC_SECONDS = 1
+   REVOCATION_PRUNE_SECONDS = 3600
+   REVOCATION_FALSE_POSITIVE_RATE = 0.001
+
+   # read replicas, GET requests are spread over them round robin.
+   # e.g. ['mysql+pymysql://root:@replica1/yucca_ltd_db']
+   SQLALCHEMY_REPLICA_URIS = []
+   # how long a replica that failed to connect is left out
+   REPLICA_EJECT_SECONDS = 30
+   # after a write the same client reads from the primary for this long
+   READ_YOUR_WRITES_SECONDS = 5
+
+   # per endpoint latency and SQL metrics at /metrics
+   METRICS_ENABLED = True
+
       
+
+   # N+1 / query budget guard for development and tests: None (off), "warn"
+   # logs routes over their @query_budget, "raise" turns them into a 500.
+   # The same SQL running this many times in one request counts as an N+1.
+   QUERY_GUARD = None
+   N_PLUS_ONE_THRESHOLD = 3
+
+   # asgi.py serves the list endpoints on an async engine, by default the
+   # same database with the async driver (mysql+aiomysql / sqlite+aiosqlite)
+   SQLALCHEMY_ASYNC_DATABASE_URI = None
+   ASYNC_DB_POOL_SIZE = 20
@@ -0,0 +1,52 @@
+"""service rating stats
+
+Revision ID: 3f6a1c2d9b84
+Revises: 952ccc297676
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6a1c2d9b84'
+down_revision = '952ccc297676'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('service_rating_stats',
+    sa.Column('service_id', sa.Integer(), nullable=False),
+    sa.Column('rating_count', sa.Integer(), nullable=False),
+    sa.Column('rating_sum', sa.Integer(), nullable=False),
+    sa.Column('rating_1', sa.Integer(), nullable=False),
+    sa.Column('rating_2', sa.Integer(), nullable=False),
+    sa.Column('rating_3', sa.Integer(), nullable=False),
+    sa.Column('rating_4', sa.Integer(), nullable=False),
+    sa.Column('rating_5', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['service_id'], ['services.service_id'], ),
+    sa.PrimaryKeyConstraint('service_id')
+    )
+
+    # fill it from the feedbacks already in the table
+    op.execute("""
+        INSERT INTO service_rating_stats
+            (service_id, rating_count, rating_sum, rating_1, rating_2, rating_3, rating_4, rating_5, updated_at)
+        SELECT service_id, COUNT(*), SUM(rating),
+            SUM(CASE WHEN rating = 1 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating = 2 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating = 3 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating = 4 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN rating = 5 THEN 1 ELSE 0 END),
+            CURRENT_TIMESTAMP
+        FROM feedbacks
+        WHERE service_id IS NOT NULL AND rating BETWEEN 1 AND 5
+        GROUP BY service_id
+    """)
+
+
+def downgrade():
+    op.drop_table('service_rating_stats')
@@ -0,0 +1,36 @@
+"""lookup indexes
+
+Revision ID: 8c2e5b7a41d0
+Revises: 3f6a1c2d9b84
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c2e5b7a41d0'
+down_revision = '3f6a1c2d9b84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_users_contact', 'users', ['contact'], unique=False)
+    op.create_index('ix_farmers_name', 'farmers', ['name'], unique=False)
+    op.create_index('ix_services_name', 'services', ['name'], unique=False)
+    op.create_index('ix_bookings_user_id_status', 'bookings', ['user_id', 'status'], unique=False)
+    op.create_index('ix_bookings_service_id', 'bookings', ['service_id'], unique=False)
+    op.create_index('ix_feedbacks_farmer_id', 'feedbacks', ['farmer_id'], unique=False)
+    op.create_index('ix_feedbacks_service_id', 'feedbacks', ['service_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_feedbacks_service_id', table_name='feedbacks')
+    op.drop_index('ix_feedbacks_farmer_id', table_name='feedbacks')
+    op.drop_index('ix_bookings_service_id', table_name='bookings')
+    op.drop_index('ix_bookings_user_id_status', table_name='bookings')
+    op.drop_index('ix_services_name', table_name='services')
+    op.drop_index('ix_farmers_name', table_name='farmers')
+    op.drop_index('ix_users_contact', table_name='users')
@@ -0,0 +1,33 @@
+"""row timestamps
+
+Revision ID: b41d7e9c2a35
+Revises: 8c2e5b7a41d0
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b41d7e9c2a35'
+down_revision = '8c2e5b7a41d0'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ['users', 'services', 'farmers', 'bookings', 'feedbacks']
+
+
+def upgrade():
+    # rows never updated have no updated_at, the ETag table versions need one
+    for table in TABLES:
+        op.execute(f'UPDATE {table} SET updated_at = created_at WHERE updated_at IS NULL')
+
+    op.create_index('ix_services_updated_at', 'services', ['updated_at'], unique=False)
+    op.create_index('ix_farmers_updated_at', 'farmers', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_farmers_updated_at', table_name='farmers')
+    op.drop_index('ix_services_updated_at', table_name='services')
@@ -0,0 +1,60 @@
+"""unique create keys
+
+Revision ID: d58f3a0e6c12
+Revises: b41d7e9c2a35
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd58f3a0e6c12'
+down_revision = 'b41d7e9c2a35'
+branch_labels = None
+depends_on = None
+
+
+# the lookup indexes of 8c2e5b7a41d0 become unique
+UNIQUE_INDEXES = [
+    ('ix_users_contact', 'users', ['contact']),
+    ('ix_farmers_name', 'farmers', ['name']),
+    ('ix_services_name', 'services', ['name']),
+    ('ix_bookings_user_id_status', 'bookings', ['user_id', 'status']),
+]
+
+
+def upgrade():
+    # the old SELECT-then-INSERT checks could race, refuse to run over
+    # duplicates instead of deleting anyone's rows
+    connection = op.get_bind()
+    for name, table, columns in UNIQUE_INDEXES:
+        column_list = ', '.join(columns)
+        # NULLs never collide in a unique index
+        not_null = ' AND '.join(f'{column} IS NOT NULL' for column in columns)
+        duplicates = connection.execute(sa.text(
+            f'SELECT {column_list}, COUNT(*) FROM {table} WHERE {not_null} '
+            f'GROUP BY {column_list} HAVING COUNT(*) > 1 LIMIT 10'
+        )).fetchall()
+        if duplicates:
+            raise RuntimeError(f'{table} has duplicate ({column_list}) values, resolve them first: {duplicates}')
+
+    for name, table, columns in UNIQUE_INDEXES:
+        _replace_index(name, table, columns, unique=True)
+
+
+def downgrade():
+    for name, table, columns in UNIQUE_INDEXES:
+        _replace_index(name, table, columns, unique=False)
+
+
+def _replace_index(name, table, columns, unique):
+    if op.get_bind().dialect.name == 'mysql':
+        # one ALTER, ix_bookings_user_id_status backs the user_id foreign key
+        # and mysql refuses to drop it on its own
+        kind = 'UNIQUE INDEX' if unique else 'INDEX'
+        op.execute(f'ALTER TABLE {table} DROP INDEX {name}, ADD {kind} {name} ({", ".join(columns)})')
+    else:
+        op.drop_index(name, table_name=table)
+        op.create_index(name, table, columns, unique=unique)
@@ -0,0 +1,29 @@
+"""table versions
+
+Revision ID: f2c8d6a1b947
+Revises: e7b1c94f3a20
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c8d6a1b947'
+down_revision = 'e7b1c94f3a20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    table_versions = op.create_table('table_versions',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(table_versions, [{'name': 'farmers', 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('table_versions')
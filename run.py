@@ -1,7 +1,35 @@
+import argparse
+import logging
+
 from app import create_app   # importing factory functioun or our instance
+from app.prefork import PreforkServer
 
 
 app = create_app()
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    # python run.py          development server, debugger on
+    # python run.py serve    pre-fork production server, see app/prefork.py
+    parser = argparse.ArgumentParser(description="Run the Yucca API.")
+    parser.add_argument("mode", nargs="?", choices=["dev", "serve"], default="dev")
+    parser.add_argument("--bind", default=app.config["SERVER_BIND"], help="host:port")
+    parser.add_argument("--workers", type=int, default=app.config["SERVER_WORKERS"], help="default 2 x cpus + 1")
+    parser.add_argument("--threads", type=int, default=app.config["SERVER_THREADS"])
+    parser.add_argument("--max-requests", type=int, default=app.config["SERVER_MAX_REQUESTS"], help="0 never recycles")
+    parser.add_argument("--max-requests-jitter", type=int, default=app.config["SERVER_MAX_REQUESTS_JITTER"])
+    parser.add_argument("--graceful-timeout", type=int, default=app.config["SERVER_GRACEFUL_TIMEOUT"])
+    args = parser.parse_args()
+
+    if args.mode == "dev":
+        app.run(debug=True)  # Run the app
+    else:
+        logging.basicConfig(level=logging.INFO, format="[%(asctime)s] [%(process)d] %(levelname)s %(message)s")
+        PreforkServer(
+            app,
+            bind=args.bind,
+            workers=args.workers,
+            threads=args.threads,
+            max_requests=args.max_requests,
+            max_requests_jitter=args.max_requests_jitter,
+            graceful_timeout=args.graceful_timeout,
+        ).run()